@@ -0,0 +1,210 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from settings import ARTIFACT_DIR, ARTIFACT_MAX_BYTES
+
+
+# ---------- CONTENT-ADDRESSED ARTIFACT STORE ----------
+class ArtifactStore:
+    """Directory of finished downloads keyed by (extractor, video id, format).
+
+    Every artifact lives in ``<root>/<key>/<filename>``. Downloads are staged
+    under ``<root>/.tmp`` and moved into place with a single rename, so other
+    processes never see a partial file. Directory mtimes double as the LRU
+    clock: reads touch them, and eviction removes the oldest first once the
+    store grows past ``max_bytes``. Keys listed in ``<root>/.pinned`` are
+    never evicted; the list is a file because workers evict, not the server.
+    Each server process keeps its own pins there until they expire.
+    """
+
+    STALE_STAGING_AGE = 24 * 60 * 60
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._staging = os.path.join(root, ".tmp")
+        self._pinned = os.path.join(root, ".pinned")
+        self._lock = threading.Lock()
+        os.makedirs(self._staging, exist_ok=True)
+
+    @staticmethod
+    def key(extractor, video_id, format_selector):
+        raw = f"{extractor}\0{video_id}\0{format_selector}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()[:32]
+
+    def _path(self, key):
+        path = os.path.join(self.root, key)
+        try:
+            names = os.listdir(path)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return os.path.join(path, names[0]) if names else None
+
+    def get(self, key):
+        """Return the path of the stored artifact for ``key``, or None."""
+        path = self._path(key)
+        self.count(hit=path is not None)
+        return path
+
+    def count(self, hit):
+        """Count a lookup made elsewhere, e.g. in a download worker process."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    @contextlib.contextmanager
+    def staging_dir(self):
+        """Temporary directory on the store's filesystem to download into."""
+        with tempfile.TemporaryDirectory(dir=self._staging) as tmpdir:
+            yield tmpdir
+
+    def publish(self, key, filepath):
+        """Atomically move a finished file into the store and return its new path."""
+        pending = tempfile.mkdtemp(dir=self._staging, suffix=".pub")
+        os.rename(filepath, os.path.join(pending, os.path.basename(filepath)))
+        target = os.path.join(self.root, key)
+        # Under the eviction lock, so no other worker evicts the target before we return it
+        with self._evict_lock():
+            try:
+                os.rename(pending, target)
+            except OSError:
+                # Another worker published the same artifact first; keep theirs.
+                shutil.rmtree(pending, ignore_errors=True)
+            self._evict(keep=target)
+            return self._path(key)
+
+    def _read_pins(self):
+        try:
+            with open(self._pinned) as f:
+                pins = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        return {owner: pin for owner, pin in pins.items() if pin["expires"] > now}
+
+    def pin(self, keys, ttl):
+        """Replace this process's pinned artifact keys, kept for ``ttl`` seconds.
+
+        Pins of other processes are kept until they expire.
+        """
+        with open(self._pinned + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            pins = self._read_pins()
+            pins[str(os.getpid())] = {"expires": time.time() + ttl, "keys": sorted(keys)}
+            fd, tmp = tempfile.mkstemp(dir=self._staging, suffix=".pin")
+            with os.fdopen(fd, "w") as f:
+                json.dump(pins, f)
+            os.replace(tmp, self._pinned)
+
+    def pinned(self):
+        """Artifact keys pinned by any process."""
+        return {key for pin in self._read_pins().values() for key in pin["keys"]}
+
+    def evict(self, keep=None):
+        """Remove least recently used artifacts until the store fits its quota.
+
+        ``keep`` is an artifact directory that must survive, e.g. one just published.
+        """
+        with self._evict_lock():
+            self._evict(keep)
+
+    @contextlib.contextmanager
+    def _evict_lock(self):
+        # Every worker evicts after it publishes; one at a time across processes
+        with open(os.path.join(self.root, ".evict.lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _evict(self, keep):
+        pinned = self.pinned()
+        entries = []
+        total = 0
+        for entry in os.scandir(self.root):
+            if entry.name == ".tmp" or not entry.is_dir():
+                continue
+            try:
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                # Removed while we looked, e.g. replaced by another worker
+                continue
+            total += size
+            if entry.path == keep or entry.name in pinned:
+                # Counts toward the quota but is never removed
+                continue
+            entries.append((mtime, size, entry.path))
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+        # Staging directories left behind by crashed workers
+        cutoff = time.time() - self.STALE_STAGING_AGE
+        for entry in os.scandir(self._staging):
+            try:
+                stale = entry.stat().st_mtime < cutoff
+            except FileNotFoundError:
+                # Another job's staging directory, finished meanwhile
+                continue
+            if stale:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_store = ArtifactStore(ARTIFACT_DIR, ARTIFACT_MAX_BYTES)
+
+
+def artifact_key(info, format_selector):
+    return ArtifactStore.key(info.get("extractor_key"), info.get("id"), format_selector)
+
+
+def get_artifact(key):
+    return _store.get(key)
+
+
+def find_artifact(key):
+    """Path of the artifact for ``key`` without counting a cache lookup."""
+    return _store._path(key)
+
+
+def count_artifact_lookup(hit):
+    _store.count(hit)
+
+
+def staging_dir():
+    return _store.staging_dir()
+
+
+def publish_artifact(key, filepath):
+    return _store.publish(key, filepath)
+
+
+def pin_artifacts(keys, ttl):
+    _store.pin(keys, ttl)
+
+
+def artifact_stats():
+    return _store.stats()
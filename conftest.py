@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Modules create their caches under CACHE_DIR on import; keep tests out of the repo's .cache
+os.environ.setdefault("YTMP4_CACHE_DIR", tempfile.mkdtemp(prefix="ytmp4-test-"))
@@ -0,0 +1,159 @@
+import copy
+import os
+import resource
+import sys
+import time
+
+from settings import YDLP_COMMON, JOB_MAX_RSS_MB
+from metadata import get_info, get_download_info
+from artifacts import artifact_key, find_artifact, staging_dir, publish_artifact
+from progress import ProgressTracker
+from ydl_pool import borrow_ydl
+import segmented
+
+
+# ---------- WORKER PROCESS SIDE ----------
+# Runs inside the download process pool. Progress goes back to the server
+# process as (job_id, fields) tuples on a multiprocessing queue.
+_progress = None
+# Set once this process went over JOB_MAX_RSS_MB. CPython rarely returns
+# freed heap to the OS, so the process stays bloated and has to be replaced.
+_over_limit = False
+
+
+def init_worker(progress_queue):
+    global _progress
+    _progress = progress_queue
+
+
+def _report(job_id, **fields):
+    _progress.put((job_id, fields))
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No procfs: fall back to the peak, which ru_maxrss reports in KiB (bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _check_memory():
+    global _over_limit
+    if JOB_MAX_RSS_MB and _rss_bytes() > JOB_MAX_RSS_MB * 1024 * 1024:
+        _over_limit = True
+        raise MemoryError(f"Download worker exceeded {JOB_MAX_RSS_MB} MB")
+
+
+def _progress_reporter(job_id, tracker):
+    def report(downloaded_bytes, total_bytes, force=False):
+        if tracker.update(downloaded_bytes, total_bytes, force):
+            _check_memory()
+            _report(job_id, **tracker.snapshot())
+
+    return report
+
+
+def _download_segmented(ydl, info, job_id, connections, report):
+    """Fetch a selected progressive format with the ranged downloader.
+
+    Returns the file path, or None when the format is not a single plain
+    HTTP file (merged, DASH/HLS) or the ranged transfer fails.
+    """
+    selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+    if selected.get("requested_formats") or selected.get("protocol") not in ("http", "https"):
+        return None
+
+    headers = dict(selected.get("http_headers") or {})
+    cookies = ydl.cookiejar.get_cookie_header(selected["url"])
+    if cookies:
+        headers["Cookie"] = cookies
+
+    filepath = ydl.prepare_filename(selected)
+    try:
+        segmented.download(selected["url"], headers, filepath, connections, progress=report)
+    except segmented.SegmentedDownloadError:
+        return None
+    size = os.path.getsize(filepath)
+    report(size, size, force=True)
+    return filepath
+
+
+def _download(job_id, url, info, format_selector, key, fragment_concurrency, connections):
+    stats = {"fragmented": False, "segmented": False}
+    report = _progress_reporter(job_id, ProgressTracker())
+
+    def progress_hook(d):
+        if d["status"] in ("downloading", "finished"):
+            # DASH/HLS downloads report which fragment they are on
+            stats["fragmented"] = stats["fragmented"] or "fragment_index" in d
+            report(
+                d.get("downloaded_bytes", 0),
+                d.get("total_bytes") or d.get("total_bytes_estimate"),
+                force=d["status"] == "finished",
+            )
+
+    with staging_dir() as tmpdir:
+        # One pooled instance per format; the staging directory and fragment
+        # concurrency change with every job
+        ydl_opts = {**YDLP_COMMON, "format": format_selector, "outtmpl": "%(title)s.%(ext)s"}
+        job_opts = {
+            "paths": {"home": tmpdir},
+            # Only affects segmented formats; progressive files use one connection
+            "concurrent_fragment_downloads": fragment_concurrency,
+        }
+
+        # Download from the cached info; only expiring format URLs are re-resolved
+        started = time.monotonic()
+        _report(job_id, phase="downloading")
+        with borrow_ydl(ydl_opts, progress_hook, **job_opts) as ydl:
+            info = get_download_info(url, info)
+            filepath = None
+            if connections > 1:
+                filepath = _download_segmented(ydl, info, job_id, connections, report)
+            if filepath is None:
+                downloaded_info = ydl.process_ie_result(copy.deepcopy(info), download=True)
+                filepath = ydl.prepare_filename(downloaded_info)
+            else:
+                stats["segmented"] = True
+        seconds = time.monotonic() - started
+
+        # Publish the finished file for later requests
+        _report(job_id, phase="finalizing")
+        filepath = publish_artifact(key, filepath)
+
+    return {
+        "filepath": filepath,
+        "fragmented": stats["fragmented"],
+        "segmented": stats["segmented"],
+        "download_seconds": seconds,
+        "throughput": os.path.getsize(filepath) / seconds if seconds else None,
+    }
+
+
+def run_job(job_id, url, format_selector, fragment_concurrency=1, connections=1, info=None):
+    """Download one job and return its result fields.
+
+    ``info`` is the info dict the page already resolved, if any.
+    Errors are returned as text: yt-dlp exceptions carry tracebacks that
+    cannot be pickled back to the server process.
+
+    A ``recycle`` field asks the server to replace this worker; ``retry``
+    asks it to run the job again on the replacement.
+    """
+    if _over_limit:
+        return {"retry": True, "recycle": True}
+    _report(job_id, status="running", phase="resolving")
+    try:
+        info = info or get_info(url)
+        key = artifact_key(info, format_selector)
+        # Served from the artifact store when someone already downloaded this.
+        # The server counts the lookup from the result; counters here are per worker.
+        filepath = find_artifact(key)
+        if filepath is not None:
+            return {"artifact_key": key, "filepath": filepath, "artifact_hit": True}
+        return {"artifact_key": key, **_download(job_id, url, info, format_selector, key, fragment_concurrency, connections)}
+    except Exception as e:
+        return {"error": str(e), "recycle": _over_limit}
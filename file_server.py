@@ -0,0 +1,187 @@
+import hashlib
+import hmac
+import mimetypes
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlparse
+
+from settings import (
+    CACHE_DIR,
+    FILE_SERVER_HOST,
+    FILE_SERVER_PORT,
+    FILE_SERVER_URL,
+    FILE_SERVER_SECRET,
+    FILE_TOKEN_TTL,
+)
+from artifacts import find_artifact
+
+
+# ---------- SIGNED LINKS ----------
+def _load_secret():
+    if FILE_SERVER_SECRET:
+        return FILE_SERVER_SECRET.encode("utf-8")
+    path = os.path.join(CACHE_DIR, "file_server.key")
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(path, "rb") as f:
+            return f.read()
+    secret = os.urandom(32)
+    with os.fdopen(fd, "wb") as f:
+        f.write(secret)
+    return secret
+
+
+_SECRET = _load_secret()
+
+
+def _sign(key, expires):
+    return hmac.new(_SECRET, f"{key}:{expires}".encode("ascii"), hashlib.sha256).hexdigest()
+
+
+_EXPIRES = re.compile(r"[0-9]{1,12}")
+_SIGNATURE = re.compile(r"[0-9a-f]{64}")
+
+
+def _token_valid(key, query):
+    params = parse_qs(query)
+    expires = params.get("exp", [""])[0]
+    signature = params.get("sig", [""])[0]
+    # ASCII only: str.isdigit() accepts other scripts' digits, and
+    # compare_digest() raises on non-ASCII text
+    if not (_EXPIRES.fullmatch(expires) and _SIGNATURE.fullmatch(signature)):
+        return False
+    if int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature.encode("ascii"), _sign(key, expires).encode("ascii"))
+
+
+def artifact_url(key, filepath):
+    """Signed link to an artifact, valid for ``FILE_TOKEN_TTL`` seconds."""
+    expires = str(int(time.time()) + FILE_TOKEN_TTL)
+    return (
+        f"{FILE_SERVER_URL}/a/{key}/{quote(os.path.basename(filepath))}"
+        f"?exp={expires}&sig={_sign(key, expires)}"
+    )
+
+
+# ---------- ARTIFACT FILE SERVER ----------
+# Streams finished artifacts straight from disk, so serving a large file
+# costs a constant amount of memory instead of the whole file per user.
+# Range, If-Range and ETag let clients resume or split their own fetches.
+_ARTIFACT_PATH = re.compile(r"^/a/([0-9a-f]{32})/[^/]+$")
+_BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header, size):
+    """Return ``(start, end)`` for a single byte range, "invalid", or None to send everything."""
+    match = _BYTE_RANGE.match(header.strip())
+    if match is None:
+        # Multiple or malformed ranges: the full body is a valid answer
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    elif last:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        return None
+    if start >= size or end < start:
+        return "invalid"
+    return start, end
+
+
+class ArtifactHandler(BaseHTTPRequestHandler):
+    server_version = "ytmp4"
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def _serve(self, send_body):
+        url = urlparse(self.path)
+        match = _ARTIFACT_PATH.match(url.path)
+        if match is None:
+            self.send_error(404)
+            return
+        if not _token_valid(match.group(1), url.query):
+            self.send_error(403, "Link expired or invalid")
+            return
+        filepath = find_artifact(match.group(1))
+        if filepath is None:
+            self.send_error(404)
+            return
+
+        with open(filepath, "rb") as f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+            filename = os.path.basename(filepath)
+
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            byte_range = None
+            if self.headers.get("Range") and self.headers.get("If-Range", etag) == etag:
+                byte_range = _parse_range(self.headers["Range"], size)
+            if byte_range == "invalid":
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+
+            if byte_range is None:
+                start, end = 0, size - 1
+                self.send_response(200)
+            else:
+                start, end = byte_range
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.send_header("Content-Type", mimetypes.guess_type(filename)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(filename)}")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.end_headers()
+            if send_body and end >= start:
+                # socket.sendfile uses the sendfile syscall where available
+                self.connection.sendfile(f, start, end - start + 1)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_file_server():
+    """Serve artifacts on a daemon thread; safe to call on every Streamlit rerun."""
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return
+        try:
+            _server = ThreadingHTTPServer((FILE_SERVER_HOST, FILE_SERVER_PORT), ArtifactHandler)
+        except OSError:
+            # Another worker on this node already serves the shared artifact directory.
+            _server = False
+            return
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="file-server", daemon=True).start()
+
+
+if __name__ == "__main__":
+    ThreadingHTTPServer((FILE_SERVER_HOST, FILE_SERVER_PORT), ArtifactHandler).serve_forever()
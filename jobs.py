@@ -0,0 +1,361 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from settings import (
+    DOWNLOAD_WORKERS,
+    JOB_RETENTION,
+    WORKER_MAX_JOBS,
+    FRAGMENT_CONCURRENCY,
+    FRAGMENT_MAX_CONCURRENCY,
+    FRAGMENT_TARGET_MBPS,
+    SEGMENTED_CONNECTIONS,
+    PROGRESS_HISTORY,
+    JOBS_DB,
+)
+from download_worker import init_worker, run_job
+from artifacts import count_artifact_lookup
+from store import JobStore
+from urls import video_key
+from request_log import log_request
+
+
+# ---------- JOB OWNERSHIP ----------
+# The registry outlives server processes. Each job records the process that
+# runs it, so a job left queued or running by a process that has since died
+# is reported as failed instead of being polled forever.
+def _boot_id():
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _start_ticks(pid):
+    # Distinguishes a process from a later one that reused its pid
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return int(f.read().rsplit(")", 1)[1].split()[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+_OWNER = [_boot_id(), os.getpid(), _start_ticks(os.getpid())]
+
+
+def _owner_alive(owner):
+    if not owner:
+        return False
+    boot_id, pid, start_ticks = owner
+    if boot_id != _OWNER[0]:
+        return False
+    if start_ticks is not None:
+        return _start_ticks(pid) == start_ticks
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+# ---------- DOWNLOAD JOB ----------
+class Job:
+    """A download request moving through queued -> running -> done/failed.
+
+    The server process updates the attributes from worker progress
+    messages and mirrors them to the job registry; the page only reads them.
+    ``phase`` refines the status (resolving, downloading, finalizing).
+    """
+
+    # Attributes saved to the registry and restored by from_state()
+    STATE_FIELDS = (
+        "id", "url", "format_selector", "connections", "status", "phase",
+        "downloaded_bytes", "total_bytes", "speed", "eta", "artifact_key",
+        "filepath", "error", "created", "finished", "fragment_concurrency",
+        "fragmented", "segmented", "download_seconds", "throughput", "artifact_hit",
+        "owner", "history", "baseline_speed",
+    )
+
+    def __init__(self, url, format_selector, connections=SEGMENTED_CONNECTIONS):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.format_selector = format_selector
+        self.connections = connections
+        self.key = (video_key(url), format_selector)
+        self.status = "queued"
+        self.phase = "queued"
+        self.downloaded_bytes = 0
+        self.total_bytes = None
+        self.speed = None
+        self.eta = None
+        # Ring buffer of (time, downloaded_bytes, speed) progress snapshots
+        self.history = deque(maxlen=PROGRESS_HISTORY)
+        self.artifact_key = None
+        self.filepath = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.owner = _OWNER
+        # When each phase was first reported, for the request log
+        self.phase_started = {"queued": self.created}
+        # Transfer metrics, filled in when a download (not a store hit) finishes
+        self.fragment_concurrency = 1
+        self.fragmented = False
+        self.segmented = False
+        self.download_seconds = None
+        self.throughput = None
+        # Single-connection speed measured before this job finished
+        self.baseline_speed = None
+        self.artifact_hit = False
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def matches(self, url, format_selector):
+        return self.key == (video_key(url), format_selector)
+
+    def state(self):
+        state = {name: getattr(self, name) for name in self.STATE_FIELDS}
+        state["history"] = list(self.history)
+        return state
+
+    @classmethod
+    def from_state(cls, state):
+        job = cls(state["url"], state["format_selector"], state["connections"])
+        # Rows saved before owners were recorded have no known owner
+        job.owner = None
+        for name, value in state.items():
+            setattr(job, name, value)
+        job.history = deque((tuple(sample) for sample in job.history), maxlen=PROGRESS_HISTORY)
+        return job
+
+
+# ---------- JOB QUEUE ----------
+# Downloads run in worker processes so yt-dlp's CPU-heavy Python does not
+# contend for the server's GIL. Workers are recycled after WORKER_MAX_JOBS
+# jobs. The pool size caps concurrent downloads per server process.
+_context = multiprocessing.get_context("spawn")
+_progress = _context.Queue()
+_executor = None
+_jobs = {}
+_registry = JobStore(JOBS_DB)
+# Active job per (video key, format selector); duplicates attach to it
+_inflight = {}
+_jobs_lock = threading.Lock()
+
+
+def _listen():
+    # Applies worker progress messages to the matching Job
+    while True:
+        job_id, fields = _progress.get()
+        with _jobs_lock:
+            job = _jobs.get(job_id)
+        # Messages can arrive after the result; never reopen a finished job
+        if job is not None and job.finished is None:
+            for name, value in fields.items():
+                setattr(job, name, value)
+            if "phase" in fields:
+                job.phase_started.setdefault(fields["phase"], time.time())
+            if "downloaded_bytes" in fields:
+                job.history.append((time.time(), job.downloaded_bytes, job.speed))
+            _registry.save(job.id, job.state())
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=DOWNLOAD_WORKERS,
+            mp_context=_context,
+            initializer=init_worker,
+            initargs=(_progress,),
+            max_tasks_per_child=WORKER_MAX_JOBS,
+        )
+    return _executor
+
+
+# ---------- FRAGMENT CONCURRENCY ----------
+# EWMA of bytes/s a single connection achieves, learned only from jobs that
+# used one connection. Parallel jobs are not divided down into a per-connection
+# figure: that assumes throughput grows linearly with connections, and on a
+# capped link it would keep raising the concurrency.
+_connection_speed = None
+_SPEED_SMOOTHING = 0.3
+_DEFAULT_FRAGMENT_CONCURRENCY = 4
+
+
+def _fragment_concurrency():
+    if FRAGMENT_CONCURRENCY != "auto":
+        return max(1, int(FRAGMENT_CONCURRENCY))
+    if not _connection_speed:
+        return _DEFAULT_FRAGMENT_CONCURRENCY
+    # Enough connections to fill the target bandwidth at the measured speed each
+    wanted = math.ceil(FRAGMENT_TARGET_MBPS * 1e6 / 8 / _connection_speed)
+    return min(max(wanted, 1), FRAGMENT_MAX_CONCURRENCY)
+
+
+def _record_speed(job):
+    global _connection_speed
+    # The baseline this job is compared against, before its own sample
+    job.baseline_speed = _connection_speed
+    single = not job.segmented and (not job.fragmented or job.fragment_concurrency == 1)
+    if not (job.throughput and single):
+        return
+    if _connection_speed is None:
+        _connection_speed = job.throughput
+    else:
+        _connection_speed += _SPEED_SMOOTHING * (job.throughput - _connection_speed)
+
+
+def speedup(job):
+    """Throughput of ``job`` relative to one connection, or None if unknown."""
+    if not ((job.fragmented or job.segmented) and job.throughput and job.baseline_speed):
+        return None
+    return job.throughput / job.baseline_speed
+
+
+def _log_job(job):
+    started = sorted(job.phase_started.items(), key=lambda item: item[1])
+    ends = [at for _, at in started[1:]] + [job.finished]
+    try:
+        size = os.path.getsize(job.filepath) if job.filepath else None
+    except OSError:
+        size = None
+    log_request(
+        "download",
+        id=job.key[0],
+        format=job.format_selector,
+        bytes=size,
+        phases={phase: round(end - at, 4) for (phase, at), end in zip(started, ends)},
+        cache="hit" if job.artifact_hit else "miss",
+        outcome=job.status,
+        throughput=job.throughput,
+    )
+
+
+def _retire_executor(executor):
+    # Later jobs go to a fresh pool; the old one finishes what it already
+    # started, then its processes exit
+    global _executor
+    with _jobs_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def _run(job, info):
+    for attempt in range(2):
+        with _jobs_lock:
+            executor = _get_executor()
+        try:
+            future = executor.submit(
+                run_job, job.id, job.url, job.format_selector, job.fragment_concurrency, job.connections, info
+            )
+        except RuntimeError as e:
+            # Retired by another job's callback after we got it, or broken
+            # before any callback noticed (BrokenProcessPool); try a fresh pool
+            _retire_executor(executor)
+            error = e
+            continue
+        future.add_done_callback(lambda f: _finish(job, info, executor, f))
+        return
+    _complete(job, {"error": f"Download worker failed: {error}"})
+
+
+def _finish(job, info, executor, future):
+    try:
+        result = future.result()
+    except Exception as e:
+        # The worker died (e.g. killed by the OOM killer); start a fresh pool
+        result = {"error": f"Download worker failed: {e}"}
+        _retire_executor(executor)
+    if result.pop("recycle", False):
+        # The worker went over JOB_MAX_RSS_MB and stays bloated
+        _retire_executor(executor)
+    if result.pop("retry", False):
+        _run(job, info)
+        return
+    _complete(job, result)
+
+
+def _complete(job, result):
+    if "artifact_key" in result:
+        # The worker looked the artifact up; its own counters are not visible here
+        count_artifact_lookup(result.get("artifact_hit", False))
+    for name, value in result.items():
+        setattr(job, name, value)
+    job.status = job.phase = "failed" if job.error else "done"
+    job.finished = time.time()
+    _record_speed(job)
+    _registry.save(job.id, job.state())
+    _log_job(job)
+    with _jobs_lock:
+        if _inflight.get(job.key) is job:
+            del _inflight[job.key]
+
+
+def _prune():
+    cutoff = time.time() - JOB_RETENTION
+    for job_id, job in list(_jobs.items()):
+        if job.finished is not None and job.finished < cutoff:
+            del _jobs[job_id]
+    _registry.delete_finished_before(cutoff)
+
+
+def submit_download(url, format_selector, connections=SEGMENTED_CONNECTIONS, info=None):
+    """Queue a download and return its :class:`Job` immediately.
+
+    ``connections`` > 1 fetches progressive formats in parallel byte ranges.
+    Passing the already resolved ``info`` spares the worker a metadata lookup.
+
+    If the same video and format is already being downloaded, the running
+    job is returned instead, so concurrent requests share one transfer.
+    """
+    job = Job(url, format_selector, connections)
+    with _jobs_lock:
+        if job.key in _inflight:
+            return _inflight[job.key]
+        _prune()
+        _jobs[job.id] = job
+        _inflight[job.key] = job
+    job.fragment_concurrency = _fragment_concurrency()
+    _registry.save(job.id, job.state())
+    _run(job, info)
+    return job
+
+
+def get_job(job_id):
+    """Return the job with ``job_id``, or None.
+
+    Jobs owned by another server process (or a previous run of this one)
+    come back as read-only snapshots from the registry; call again for
+    fresh progress. Unfinished jobs whose process is gone come back failed.
+    """
+    if not job_id:
+        return None
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is not None:
+        return job
+    state = _registry.load(job_id)
+    if not state:
+        return None
+    job = Job.from_state(state)
+    if job.active and not _owner_alive(job.owner):
+        job.status = job.phase = "failed"
+        job.error = "The server running this download stopped. Please try again."
+        job.finished = time.time()
+        _registry.save(job.id, job.state())
+    return job
+
+
+threading.Thread(target=_listen, name="job-progress", daemon=True).start()
@@ -0,0 +1,204 @@
+"""Summarize the request log by time bucket.
+
+    python log_report.py [--since 7d] [--bucket day] [--event lookup] [--json] [FILE ...]
+
+Reads the request log and its gzip backups (or the given files) one line
+at a time, so memory stays constant however large the logs are.
+"""
+import argparse
+import gzip
+import json
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+from settings import REQUEST_LOG, REQUEST_LOG_BACKUPS
+
+
+# ---------- QUANTILE SKETCH ----------
+class QuantileSketch:
+    """Histogram over logarithmic buckets that answers quantiles within ``accuracy``.
+
+    Each bucket spans values a factor ``(1 + accuracy) / (1 - accuracy)``
+    apart, so memory grows with the range of the values, not their number,
+    and two sketches merge by adding bucket counts.
+    """
+
+    _MIN_VALUE = 1e-6
+
+    def __init__(self, accuracy=0.01):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.buckets = Counter()
+        self.count = 0
+
+    def add(self, value):
+        self.buckets[math.ceil(math.log(max(value, self._MIN_VALUE)) / self._log_gamma)] += 1
+        self.count += 1
+
+    def merge(self, other):
+        self.buckets.update(other.buckets)
+        self.count += other.count
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Midpoint of the bucket, within the relative accuracy of every value in it
+                return 2 * self.gamma**index / (self.gamma + 1)
+
+
+# ---------- AGGREGATION ----------
+_HIT = {"memory", "disk", "preview", "hit"}
+_BUCKETS = {
+    "hour": "%Y-%m-%d %H:00",
+    "day": "%Y-%m-%d",
+    "week": "%G-W%V",
+}
+
+
+class Summary:
+    """Counts and latency/throughput sketches for one event type in one time bucket."""
+
+    def __init__(self):
+        self.count = 0
+        self.hits = 0
+        self.latency = QuantileSketch()
+        self.throughput = QuantileSketch()
+        self.bytes = 0
+        self.formats = Counter()
+        self.outcomes = Counter()
+
+    def add(self, record):
+        self.count += 1
+        if record.get("cache") in _HIT:
+            self.hits += 1
+        seconds = record.get("seconds")
+        if seconds is None and record.get("phases"):
+            seconds = sum(record["phases"].values())
+        if seconds is not None:
+            self.latency.add(seconds)
+        if record.get("throughput"):
+            self.throughput.add(record["throughput"])
+        self.bytes += record.get("bytes") or 0
+        if record.get("format"):
+            self.formats[record["format"]] += 1
+        self.outcomes[record.get("outcome", "unknown")] += 1
+
+    def report(self, top):
+        def quantiles(sketch, scale=1):
+            return {
+                name: None if value is None else round(value / scale, 4)
+                for name, value in (
+                    (name, sketch.quantile(q)) for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+                )
+            }
+
+        errors = {outcome: n for outcome, n in self.outcomes.items() if outcome not in ("ok", "done")}
+        return {
+            "count": self.count,
+            "hit_ratio": round(self.hits / self.count, 4) if self.count else None,
+            "seconds": quantiles(self.latency),
+            "throughput_mbps": quantiles(self.throughput, 1e6),
+            "bytes": self.bytes,
+            "top_formats": self.formats.most_common(top),
+            "errors": errors,
+        }
+
+
+def log_files(path=REQUEST_LOG, backups=REQUEST_LOG_BACKUPS):
+    """The log's gzip backups, oldest first, then the live file."""
+    files = [f"{path}.{n}.gz" for n in range(backups, 0, -1)] + [path]
+    return [f for f in files if os.path.exists(f)]
+
+
+def read_records(paths, since=None, stats=None):
+    """Yield log records from ``paths`` in order, skipping lines that do not parse."""
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    if stats is not None:
+                        stats["bad_lines"] += 1
+                    continue
+                if since is None or record.get("time", 0) >= since:
+                    yield record
+
+
+def summarize(records, bucket="day", event=None):
+    """Return ``{bucket: {event: Summary}}`` for a stream of records."""
+    fmt = _BUCKETS.get(bucket)
+    summaries = {}
+    for record in records:
+        if event and record.get("event") != event:
+            continue
+        key = time.strftime(fmt, time.gmtime(record.get("time", 0))) if fmt else "all"
+        by_event = summaries.setdefault(key, {})
+        by_event.setdefault(record.get("event", "unknown"), Summary()).add(record)
+    return summaries
+
+
+# ---------- CLI ----------
+def _parse_since(value):
+    match = re.fullmatch(r"(\d+)([smhdw])", value)
+    if not match:
+        raise argparse.ArgumentTypeError("expected a duration such as 30m, 24h or 7d")
+    unit = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}[match.group(2)]
+    return time.time() - int(match.group(1)) * unit
+
+
+def _print_text(report):
+    for bucket, events in report.items():
+        print(bucket)
+        for event, r in events.items():
+            seconds, mbps = r["seconds"], r["throughput_mbps"]
+            hit_ratio = "-" if r["hit_ratio"] is None else f"{r['hit_ratio']:.1%}"
+            print(
+                f"  {event:<9} n={r['count']:<7} hits={hit_ratio:<6} "
+                f"p50={seconds['p50']}s p95={seconds['p95']}s p99={seconds['p99']}s"
+            )
+            if mbps["p50"] is not None:
+                print(f"            throughput p50={mbps['p50']} MB/s p95={mbps['p95']} MB/s, {r['bytes'] / 1e6:.1f} MB")
+            if r["top_formats"]:
+                print("            formats " + ", ".join(f"{name} ({n})" for name, n in r["top_formats"]))
+            if r["errors"]:
+                print("            errors " + ", ".join(f"{name} ({n})" for name, n in sorted(r["errors"].items())))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Summarize the request log by time bucket.")
+    parser.add_argument("files", nargs="*", help="log files, plain or .gz (default: the request log and its backups)")
+    parser.add_argument("--since", type=_parse_since, help="only records newer than this, e.g. 24h or 7d")
+    parser.add_argument("--bucket", choices=[*_BUCKETS, "all"], default="day")
+    parser.add_argument("--event", choices=["lookup", "preview", "download"])
+    parser.add_argument("--top", type=int, default=3, help="formats listed per bucket")
+    parser.add_argument("--json", action="store_true", help="print JSON instead of text")
+    args = parser.parse_args(argv)
+
+    stats = Counter()
+    summaries = summarize(read_records(args.files or log_files(), args.since, stats), args.bucket, args.event)
+    report = {
+        bucket: {event: summary.report(args.top) for event, summary in sorted(events.items())}
+        for bucket, events in sorted(summaries.items())
+    }
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        _print_text(report)
+    if stats["bad_lines"]:
+        print(f"skipped {stats['bad_lines']} unreadable lines", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
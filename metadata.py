@@ -0,0 +1,366 @@
+import json
+import re
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs, quote
+
+from settings import (
+    YDLP_COMMON,
+    METADATA_TTL,
+    METADATA_MAX_ENTRIES,
+    METADATA_DB,
+    METADATA_VACUUM_INTERVAL,
+    MEDIA_URL_MARGIN,
+    NEGATIVE_TTL,
+    ALLOW_GENERIC,
+    GENERIC_TIMEOUT,
+)
+from store import MetadataStore
+from urls import video_key, extractor_hint, url_problem
+from ydl_pool import borrow_ydl
+from request_log import logged
+
+
+# ---------- TTL + LRU CACHE ----------
+class TTLCache:
+    """Thread-safe mapping whose entries expire after ``ttl`` seconds.
+
+    When more than ``max_entries`` keys are stored the least recently used
+    one is dropped, skipping keys in ``pinned``.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.pinned = frozenset()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def __contains__(self, key):
+        # Membership test that does not count as a lookup
+        return self.peek(key) is not None
+
+    def peek(self, key):
+        """Return the value for ``key`` without counting a lookup or refreshing its LRU position."""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry[1] if entry is not None and entry[0] >= time.monotonic() else None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                victim = next((k for k in self._data if k not in self.pinned), None)
+                if victim is None:
+                    break
+                del self._data[victim]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Module state survives Streamlit reruns, so this cache is shared by every session.
+_cache = TTLCache(METADATA_TTL, METADATA_MAX_ENTRIES)
+
+# Second level, shared by every worker process and kept across restarts.
+_store = MetadataStore(METADATA_DB, METADATA_VACUUM_INTERVAL)
+_store.start_vacuum()
+
+
+# ---------- SIGNED MEDIA URLS ----------
+_EXPIRE_PATH = re.compile(r"/expire/(\d+)")
+
+
+def _url_expiry(url):
+    parsed = urlparse(url)
+    value = parse_qs(parsed.query).get("expire", [None])[0]
+    if value is None:
+        match = _EXPIRE_PATH.search(parsed.path)
+        value = match.group(1) if match else None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def media_expiry(info):
+    """Return the earliest ``expire=`` timestamp of any media URL in ``info``, or None."""
+    expiries = []
+    for fmt in [info, *(info.get("formats") or [])]:
+        for field in ("url", "manifest_url", "fragment_base_url"):
+            if fmt.get(field):
+                expiry = _url_expiry(fmt[field])
+                if expiry is not None:
+                    expiries.append(expiry)
+    return min(expiries, default=None)
+
+
+# ---------- NEGATIVE CACHE ----------
+class LookupFailed(Exception):
+    """A link that cannot be resolved, with a ``reason`` such as "private" or "removed"."""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+# Failures that will not fix themselves within minutes. Anything else
+# (timeouts, throttling) is retried on the next lookup.
+_FAILURE_PATTERNS = (
+    ("private", re.compile(r"private video|members.only|confirm your age|login required|requires authentication", re.I)),
+    ("removed", re.compile(r"video unavailable|has been removed|no longer available|does not exist|HTTP Error 404", re.I)),
+    ("geo-blocked", re.compile(r"not available in your country|geo.?restrict", re.I)),
+    ("unsupported", re.compile(r"unsupported url|no suitable extractor", re.I)),
+)
+_failures = TTLCache(NEGATIVE_TTL, METADATA_MAX_ENTRIES)
+
+
+def _classify(error):
+    from yt_dlp.utils import DownloadError, GeoRestrictedError, UnsupportedError
+
+    cause = error.exc_info[1] if isinstance(error, DownloadError) and error.exc_info else error
+    if isinstance(cause, GeoRestrictedError):
+        return "geo-blocked"
+    if isinstance(cause, UnsupportedError):
+        return "unsupported"
+    for reason, pattern in _FAILURE_PATTERNS:
+        if pattern.search(str(error)):
+            return reason
+    return None
+
+
+def _check(url, key):
+    """Raise :class:`LookupFailed` for malformed input or a recently failed link, without I/O."""
+    problem = url_problem(url)
+    if problem:
+        raise LookupFailed("invalid", problem)
+    if not ALLOW_GENERIC and extractor_hint(url) is None:
+        raise LookupFailed("unsupported", "This site is not supported.")
+    failure = _failures.get(key)
+    if failure is not None:
+        raise LookupFailed(*failure)
+
+
+def _run_ydl(key, call):
+    # yt_dlp is imported where it is used: loading it dominates cold start,
+    # and startup.py warms it up off the first-paint path
+    from yt_dlp.utils import DownloadError
+
+    try:
+        return call()
+    except DownloadError as e:
+        reason = _classify(e)
+        if reason is None:
+            raise
+        _failures.put(key, (reason, str(e)))
+        raise LookupFailed(reason, str(e)) from e
+
+
+# ---------- METADATA LOOKUP ----------
+def _ydl_options(url):
+    """YoutubeDL options and ``ie_key`` hint for looking up ``url``."""
+    hint = extractor_hint(url)
+    if hint is None:
+        # Left to the generic extractor, which may crawl an arbitrary page
+        return {**YDLP_COMMON, "socket_timeout": GENERIC_TIMEOUT}, None
+    return YDLP_COMMON, hint
+
+
+def _extract(key, url):
+    def extract():
+        options, hint = _ydl_options(url)
+        with borrow_ydl(options) as ydl:
+            # The hint skips yt-dlp's own scan over every extractor's URL pattern
+            info = ydl.extract_info(url, download=False, ie_key=hint)
+            # Clean, JSON-serializable info that can be stored and re-processed later
+            return ydl.sanitize_info(info, remove_private_keys=True)
+
+    info = _run_ydl(key, extract)
+    entry = (info, media_expiry(info))
+    _store.put(key, entry, METADATA_TTL)
+    _cache.put(key, entry)
+    return entry
+
+
+def _cached(key):
+    """Return ``(entry, source)``; the source is "memory", "disk" or None on a miss."""
+    entry = _cache.get(key)
+    if entry is not None:
+        return entry, "memory"
+    entry = _store.get(key)
+    if entry is None:
+        return None, None
+    _cache.put(key, entry)
+    return entry, "disk"
+
+
+def _lookup(url):
+    key = video_key(url)
+    with logged("lookup", id=key) as record:
+        entry, record["cache"] = _cached(key)
+        if entry is None:
+            record["cache"] = "miss"
+            _check(url, key)
+            entry = _extract(key, url)
+    return key, entry
+
+
+def get_info(url):
+    """Return the yt-dlp info dict for ``url``, extracting it only on a cache miss.
+
+    Lookups try the in-process cache, then the on-disk store, then yt-dlp.
+    Format URLs in the result may already have expired; use
+    :func:`get_download_info` before downloading.
+    The returned dict is shared between sessions and must not be modified.
+    """
+    return _lookup(url)[1][0]
+
+
+def get_download_info(url, info=None):
+    """Like :func:`get_info`, but with media URLs valid for at least ``MEDIA_URL_MARGIN`` seconds.
+
+    Title, thumbnail and uploader never go stale within the TTL, so only
+    entries whose signed format URLs are about to expire are re-extracted.
+    An ``info`` dict the caller already resolved is reused while it is fresh.
+    """
+    if info is not None:
+        expires = media_expiry(info)
+        if expires is None or expires - time.time() >= MEDIA_URL_MARGIN:
+            return info
+    key, (info, expires) = _lookup(url)
+    if expires is not None and expires - time.time() < MEDIA_URL_MARGIN:
+        info, expires = _extract(key, url)
+    return info
+
+
+def peek_info(url):
+    """Return the cached info dict for ``url`` without extracting, or None."""
+    entry, _ = _cached(video_key(url))
+    return entry[0] if entry else None
+
+
+def find_info(url):
+    """Like :func:`peek_info`, but without counting a cache lookup."""
+    key = video_key(url)
+    entry = _cache.peek(key)
+    if entry is None:
+        entry = _store.get(key)
+        if entry is not None:
+            _cache.put(key, entry)
+    return entry[0] if entry else None
+
+
+# ---------- FAST PREVIEW ----------
+# Title, uploader and thumbnail are all the page needs before Download is
+# pressed. YouTube's oEmbed endpoint answers those in one small request,
+# while a full extraction resolves every format, signature and manifest.
+_OEMBED_URL = "https://www.youtube.com/oembed?format=json&url="
+_PREVIEW_TIMEOUT = 3
+_previews = TTLCache(METADATA_TTL, METADATA_MAX_ENTRIES)
+_prefetch = ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch")
+_prefetching = set()
+_prefetch_lock = threading.Lock()
+
+
+def _oembed_preview(key, url):
+    video_id = key.split(":", 1)[1]
+    request = urllib.request.Request(
+        _OEMBED_URL + quote(f"https://www.youtube.com/watch?v={video_id}", safe=""),
+        headers=YDLP_COMMON["http_headers"],
+    )
+    with urllib.request.urlopen(request, timeout=_PREVIEW_TIMEOUT) as response:
+        data = json.load(response)
+    return {
+        "title": data.get("title"),
+        "uploader": data.get("author_name"),
+        "thumbnail": f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+    }
+
+
+def get_preview(url):
+    """Return a dict with the ``title``, ``uploader`` and ``thumbnail`` of ``url``.
+
+    Uses the full info when it is already cached, otherwise YouTube's
+    oEmbed endpoint; links to other sites are resolved fully. Pair it with :func:`prefetch_info` to resolve the
+    formats in the background while the user looks at the preview.
+    """
+    key = video_key(url)
+    with logged("preview", id=key) as record:
+        entry, record["cache"] = _cached(key)
+        if entry is not None:
+            return entry[0]
+
+        if not key.startswith("youtube:"):
+            # Other sites have no cheap preview: their extractors make the
+            # same network requests with or without format selection, so
+            # resolve fully once instead of extracting twice
+            record["cache"] = "miss"
+            return get_info(url)
+
+        preview = _previews.get(key)
+        record["cache"] = "preview" if preview is not None else "miss"
+        if preview is None:
+            _check(url, key)
+            try:
+                preview = _oembed_preview(key, url)
+            except (OSError, ValueError):
+                # Private, removed or embedding disabled: a full extraction
+                # reports the real reason
+                return get_info(url)
+            _previews.put(key, preview)
+        return preview
+
+
+def _prefetch_info(key, url):
+    try:
+        get_info(url)
+    except Exception:
+        # The download job will extract again and report the error
+        pass
+    finally:
+        with _prefetch_lock:
+            _prefetching.discard(key)
+
+
+def prefetch_info(url):
+    """Resolve the full info for ``url`` on a background thread, once per video."""
+    key = video_key(url)
+    with _prefetch_lock:
+        if key in _prefetching or key in _cache:
+            return
+        _prefetching.add(key)
+    _prefetch.submit(_prefetch_info, key, url)
+
+
+def pin_info(keys):
+    """Keep the cached info of these video keys out of LRU eviction (they still expire)."""
+    _cache.pinned = frozenset(keys)
+
+
+def cache_stats():
+    return _cache.stats()
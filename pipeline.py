@@ -0,0 +1,34 @@
+# ---------- SESSION PIPELINE ----------
+class SessionPipeline:
+    """Outputs of the resolve -> choose -> download -> deliver stages of one session.
+
+    Each stage remembers the inputs it last ran with. :meth:`run` only
+    recomputes a stage when those inputs change, and then forgets every
+    later stage, since their outputs were derived from the old value.
+    Kept in ``st.session_state`` so widget reruns reuse earlier stages.
+    """
+
+    STAGES = ("resolve", "choose", "download", "deliver")
+
+    def __init__(self):
+        self._inputs = {}
+        self._outputs = {}
+
+    def get(self, stage, inputs):
+        """Output of ``stage`` if it last ran with ``inputs``, else None."""
+        if stage in self._outputs and self._inputs[stage] == inputs:
+            return self._outputs[stage]
+        return None
+
+    def set(self, stage, inputs, output):
+        for later in self.STAGES[self.STAGES.index(stage):]:
+            self._inputs.pop(later, None)
+            self._outputs.pop(later, None)
+        self._inputs[stage] = inputs
+        self._outputs[stage] = output
+
+    def run(self, stage, inputs, compute):
+        """Return the output of ``stage``, calling ``compute()`` only if its inputs changed."""
+        if stage not in self._outputs or self._inputs[stage] != inputs:
+            self.set(stage, inputs, compute())
+        return self._outputs[stage]
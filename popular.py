@@ -0,0 +1,175 @@
+import hashlib
+import heapq
+import logging
+import threading
+import time
+
+from settings import (
+    POPULAR_TOP_K,
+    POPULAR_MIN_COUNT,
+    POPULAR_HALF_LIFE,
+    POPULAR_PREWARM_INTERVAL,
+    POPULAR_PREWARM_ARTIFACTS,
+)
+from metadata import find_info, prefetch_info, pin_info
+from artifacts import artifact_key, find_artifact, pin_artifacts
+from jobs import submit_download
+from urls import video_key
+
+
+# ---------- HEAVY HITTERS ----------
+# A few videos get most of the traffic. A count-min sketch estimates how
+# often each (video, format) was requested in constant memory, and a min-heap
+# keeps the k with the highest estimates.
+log = logging.getLogger(__name__)
+
+
+class CountMinSketch:
+    """Approximate counts that never undercount, in ``width * depth`` cells."""
+
+    def __init__(self, width, depth):
+        self.width = width
+        self._rows = [[0.0] * width for _ in range(depth)]
+
+    def _cells(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+        return [(row, (h1 + i * h2) % self.width) for i, row in enumerate(self._rows)]
+
+    def add(self, item, count=1):
+        """Count ``item`` and return its new estimate."""
+        cells = self._cells(item)
+        for row, index in cells:
+            row[index] += count
+        return min(row[index] for row, index in cells)
+
+    def decay(self, factor):
+        for row in self._rows:
+            for index, value in enumerate(row):
+                row[index] = value * factor
+
+
+class HeavyHitters:
+    """The ``k`` most frequent items seen so far, with their estimated counts."""
+
+    def __init__(self, k, width=2048, depth=4):
+        self.k = k
+        self._sketch = CountMinSketch(width, depth)
+        self._top = {}
+        # (estimate, name, item) entries; stale ones are skipped when popped
+        self._heap = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _name(item):
+        return "\0".join(str(part) for part in item)
+
+    def _smallest(self):
+        while True:
+            count, _, item = self._heap[0]
+            if self._top.get(item) == count:
+                return item
+            heapq.heappop(self._heap)
+
+    def add(self, item):
+        with self._lock:
+            name = self._name(item)
+            estimate = self._sketch.add(name)
+            if item not in self._top and len(self._top) >= self.k:
+                smallest = self._smallest()
+                if estimate <= self._top[smallest]:
+                    return
+                del self._top[smallest]
+            self._top[item] = estimate
+            heapq.heappush(self._heap, (estimate, name, item))
+            if len(self._heap) > 4 * self.k:
+                self._rebuild()
+
+    def _rebuild(self):
+        self._heap = [(count, self._name(item), item) for item, count in self._top.items()]
+        heapq.heapify(self._heap)
+
+    def decay(self, factor):
+        """Scale every count by ``factor`` so old popularity fades."""
+        with self._lock:
+            self._sketch.decay(factor)
+            self._top = {item: count * factor for item, count in self._top.items()}
+            self._rebuild()
+
+    def top(self):
+        """``[(item, estimate), ...]`` from most to least frequent."""
+        with self._lock:
+            return sorted(self._top.items(), key=lambda entry: entry[1], reverse=True)
+
+
+# Items are (video key, format selector); the format is None for a page view.
+_hitters = HeavyHitters(POPULAR_TOP_K)
+# Last URL seen for each tracked video, to re-resolve it
+_urls = {}
+_started = False
+_start_lock = threading.Lock()
+
+
+def record_request(url, format_selector=None):
+    """Count a view of ``url`` (no format) or a download of it in ``format_selector``."""
+    key = video_key(url)
+    _urls[key] = url
+    _hitters.add((key, format_selector))
+
+
+def popular(min_count=POPULAR_MIN_COUNT):
+    """``[((video key, format), estimate), ...]`` for the tracked items seen at least ``min_count`` times."""
+    return [(item, count) for item, count in _hitters.top() if count >= min_count]
+
+
+# ---------- PRE-WARMING ----------
+def _prewarm():
+    hot = popular()
+    video_keys = {key for (key, _), _ in hot}
+    artifact_keys = set()
+    for (key, format_selector), _ in hot:
+        url = _urls.get(key)
+        if url is None:
+            continue
+        info = find_info(url)
+        if info is None:
+            # Metadata expired or never resolved here; the next cycle sees it
+            prefetch_info(url)
+            continue
+        if format_selector is None:
+            continue
+        artifact = artifact_key(info, format_selector)
+        artifact_keys.add(artifact)
+        if POPULAR_PREWARM_ARTIFACTS and find_artifact(artifact) is None:
+            # Deduplicated against a download already in flight
+            submit_download(url, format_selector, info=info)
+
+    pin_info(video_keys)
+    # Outlives a missed cycle; pins of a process that stopped then expire
+    pin_artifacts(artifact_keys, ttl=3 * POPULAR_PREWARM_INTERVAL)
+    # Drop URLs of videos no longer tracked
+    tracked = {key for (key, _), _ in _hitters.top()}
+    for key in list(_urls):
+        if key not in tracked:
+            _urls.pop(key, None)
+
+
+def _prewarm_loop():
+    factor = 0.5 ** (POPULAR_PREWARM_INTERVAL / POPULAR_HALF_LIFE)
+    while True:
+        time.sleep(POPULAR_PREWARM_INTERVAL)
+        try:
+            _hitters.decay(factor)
+            _prewarm()
+        except Exception:
+            log.exception("pre-warming popular videos failed")
+
+
+def start_prewarming():
+    """Keep popular videos warm on a background thread; safe to call on every Streamlit rerun."""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_prewarm_loop, name="prewarm", daemon=True).start()
@@ -0,0 +1,66 @@
+import time
+
+from settings import PROGRESS_MIN_INTERVAL, PROGRESS_MAX_INTERVAL, PROGRESS_MIN_DELTA
+
+
+# ---------- PROGRESS TELEMETRY ----------
+class ProgressTracker:
+    """Turns a flood of download callbacks into occasional progress snapshots.
+
+    :meth:`update` may be called for every callback but only returns True
+    when a snapshot is worth publishing: at most every ``min_interval``
+    seconds, and only if the download moved by ``min_delta`` of its total
+    or ``max_interval`` seconds have passed. Speed is an EWMA over the
+    published intervals, which also smooths the ETA.
+    """
+
+    def __init__(
+        self,
+        min_interval=PROGRESS_MIN_INTERVAL,
+        max_interval=PROGRESS_MAX_INTERVAL,
+        min_delta=PROGRESS_MIN_DELTA,
+        smoothing=0.3,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.min_delta = min_delta
+        self.smoothing = smoothing
+        self.downloaded_bytes = 0
+        self.total_bytes = None
+        self.speed = None
+        self._published_at = time.monotonic()
+        self._published_bytes = 0
+
+    @property
+    def eta(self):
+        if not (self.speed and self.total_bytes):
+            return None
+        return max(self.total_bytes - self.downloaded_bytes, 0) / self.speed
+
+    def update(self, downloaded_bytes, total_bytes=None, force=False):
+        self.downloaded_bytes = downloaded_bytes
+        self.total_bytes = total_bytes or self.total_bytes
+
+        now = time.monotonic()
+        elapsed = now - self._published_at
+        moved = downloaded_bytes - self._published_bytes
+        if not force:
+            if elapsed < self.min_interval:
+                return False
+            if elapsed < self.max_interval and self.total_bytes and moved < self.min_delta * self.total_bytes:
+                return False
+
+        if elapsed > 0 and moved >= 0:
+            sample = moved / elapsed
+            self.speed = sample if self.speed is None else self.speed + self.smoothing * (sample - self.speed)
+        self._published_at = now
+        self._published_bytes = downloaded_bytes
+        return True
+
+    def snapshot(self):
+        return {
+            "downloaded_bytes": self.downloaded_bytes,
+            "total_bytes": self.total_bytes,
+            "speed": self.speed,
+            "eta": self.eta,
+        }
@@ -0,0 +1,133 @@
+import atexit
+import contextlib
+import fcntl
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+from settings import REQUEST_LOG, REQUEST_LOG_MAX_BYTES, REQUEST_LOG_BACKUPS
+
+
+# ---------- REQUEST LOG ----------
+# One JSON line per lookup and per download. Callers only enqueue a dict; a
+# background thread writes whatever has queued up in one append and rotates
+# the file into gzip backups by size, so logging never waits on the disk.
+_BATCH_WAIT = 1.0
+_QUEUE_SIZE = 10_000
+
+
+class RequestLog:
+    """Append-only JSON lines log written on a background thread."""
+
+    def __init__(self, path, max_bytes, backups):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=_QUEUE_SIZE)
+        self._started = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def write(self, record):
+        with self._lock:
+            if not self._started:
+                self._started = True
+                threading.Thread(target=self._run, name="request-log", daemon=True).start()
+                atexit.register(self.flush)
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            # The disk cannot keep up; losing log lines beats blocking a request
+            self.dropped += 1
+
+    def flush(self):
+        """Write everything queued so far in one append."""
+        with self._flush_lock:
+            records = []
+            while True:
+                try:
+                    records.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not records:
+                return
+            lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+            try:
+                self._append(lines)
+            except OSError:
+                self.dropped += len(records)
+
+    def _run(self):
+        while True:
+            time.sleep(_BATCH_WAIT)
+            self.flush()
+
+    def _open_locked(self):
+        # Several server processes may share the log. One may rotate it
+        # between our open() and flock(), leaving us holding the old inode,
+        # so check that the locked file is still the one at the path.
+        while True:
+            f = open(self.path, "a")
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(self.path).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            f.close()
+
+    def _append(self, lines):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._open_locked() as f:
+            f.write(lines)
+            f.flush()
+            if f.tell() >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        # requests.jsonl -> requests.jsonl.1.gz, .1.gz -> .2.gz, ...
+        for n in range(self.backups - 1, 0, -1):
+            with contextlib.suppress(FileNotFoundError):
+                os.replace(f"{self.path}.{n}.gz", f"{self.path}.{n + 1}.gz")
+        rotated = f"{self.path}.{os.getpid()}.rotating"
+        os.replace(self.path, rotated)
+        if self.backups:
+            with open(rotated, "rb") as src, gzip.open(f"{self.path}.1.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        os.remove(rotated)
+
+
+_log = RequestLog(REQUEST_LOG, REQUEST_LOG_MAX_BYTES, REQUEST_LOG_BACKUPS)
+
+
+def request_log_stats():
+    return {"dropped": _log.dropped}
+
+
+def log_request(event, **fields):
+    """Queue one ``event`` line ("lookup", "preview", "download") for the request log."""
+    _log.write({"time": round(time.time(), 3), "event": event, **fields})
+
+
+@contextlib.contextmanager
+def logged(event, **fields):
+    """Log ``event`` when the block exits, with its duration and outcome.
+
+    The block may add fields to the yielded dict. The outcome is "ok", the
+    ``reason`` of the exception that ended the block, or "error".
+    """
+    started = time.monotonic()
+    fields["outcome"] = "ok"
+    try:
+        yield fields
+    except Exception as e:
+        fields["outcome"] = getattr(e, "reason", "error")
+        raise
+    finally:
+        fields["seconds"] = round(time.monotonic() - started, 4)
+        log_request(event, **fields)
@@ -0,0 +1,147 @@
+import http.client
+import os
+import re
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+# ---------- MULTI-CONNECTION RANGED DOWNLOADER ----------
+# Splits a single progressive file into byte ranges fetched over a few
+# keep-alive connections. Servers (YouTube included) throttle individual
+# connections, so several in parallel get much closer to link speed.
+_CONTENT_RANGE = re.compile(r"bytes \d+-\d+/(\d+)")
+_READ_SIZE = 1024 * 1024
+_RETRIES = 3
+_TIMEOUT = 30
+
+
+class SegmentedDownloadError(Exception):
+    pass
+
+
+def _probe(url, headers):
+    """Return ``(final_url, size)``, or None when the server ignores Range."""
+    request = urllib.request.Request(url, headers={**headers, "Range": "bytes=0-0"})
+    try:
+        with urllib.request.urlopen(request, timeout=_TIMEOUT) as response:
+            match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+            if response.status != 206 or match is None:
+                return None
+            return response.geturl(), int(match.group(1))
+    except (http.client.HTTPException, OSError) as e:
+        # Includes HTTPError (403, 416, ...): let yt-dlp's own downloader try
+        raise SegmentedDownloadError(f"Range probe failed: {e}") from e
+
+
+def _preallocate(fd, size):
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        # Not available on every platform/filesystem; a sparse file works too
+        os.ftruncate(fd, size)
+
+
+class _Connections:
+    """One keep-alive connection per worker thread, reused across segments."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.https = parts.scheme == "https"
+        self.host = parts.netloc
+        self.path = parts.path + (f"?{parts.query}" if parts.query else "")
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = cls(self.host, timeout=_TIMEOUT)
+            self._local.conn = conn
+            with self._lock:
+                self._all.append(conn)
+        return conn
+
+    def reset(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+
+
+def download(url, headers, filepath, connections, segment_size=8 * 1024 * 1024, progress=None):
+    """Download ``url`` into ``filepath`` over ``connections`` parallel ranged requests.
+
+    ``progress(downloaded_bytes, total_bytes)`` is called as data arrives,
+    from one thread at a time.
+    Raises :class:`SegmentedDownloadError` when the server does not support
+    ranges, a range cannot be fetched or the assembled file has the wrong
+    size. ``filepath`` is removed on failure, so a caller falling back to
+    another downloader never mistakes it for a finished file.
+    """
+    probed = _probe(url, headers)
+    if probed is None:
+        raise SegmentedDownloadError("Server does not support range requests")
+    final_url, size = probed
+
+    pool = _Connections(final_url)
+    lock = threading.Lock()
+    written = [0]
+
+    def fetch(segment):
+        start, end = segment
+        for attempt in range(_RETRIES + 1):
+            conn = pool.get()
+            try:
+                conn.request("GET", pool.path, headers={**headers, "Range": f"bytes={start}-{end}"})
+                response = conn.getresponse()
+                if response.status != 206:
+                    response.read()
+                    raise SegmentedDownloadError(f"Unexpected HTTP {response.status} for range {start}-{end}")
+                while start <= end:
+                    chunk = response.read(min(_READ_SIZE, end - start + 1))
+                    if not chunk:
+                        raise http.client.IncompleteRead(b"")
+                    os.pwrite(fd, chunk, start)
+                    start += len(chunk)
+                    with lock:
+                        written[0] += len(chunk)
+                        # Under the lock, so reported totals never go backwards
+                        if progress is not None:
+                            progress(written[0], size)
+                return
+            except (http.client.HTTPException, OSError):
+                # Dropped connection: reconnect and continue from the last byte written
+                pool.reset()
+                if attempt == _RETRIES:
+                    raise
+
+    segments = [(start, min(start + segment_size, size) - 1) for start in range(0, size, segment_size)]
+    fd = os.open(filepath, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        try:
+            _preallocate(fd, size)
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                list(executor.map(fetch, segments))
+        finally:
+            os.close(fd)
+            pool.close()
+        if written[0] != size or os.path.getsize(filepath) != size:
+            raise SegmentedDownloadError(f"Expected {size} bytes, got {written[0]}")
+    except BaseException as e:
+        # The preallocated file has the full size but not the full contents
+        try:
+            os.unlink(filepath)
+        except FileNotFoundError:
+            pass
+        if isinstance(e, (http.client.HTTPException, OSError)):
+            raise SegmentedDownloadError(f"Ranged download failed: {e}") from e
+        raise
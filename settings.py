@@ -0,0 +1,152 @@
+import os
+
+
+# ---------- COMMON YT-DLP SETTINGS (Fixes 403 Forbidden) ----------
+YDLP_COMMON = {
+    "quiet": True,
+    "user_agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "http_headers": {
+        "User-Agent": (
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+            "AppleWebKit/537.36 (KHTML, like Gecko) "
+            "Chrome/120.0.0.0 Safari/537.36"
+        ),
+        "Accept-Language": "en-US,en;q=0.9",
+        "Sec-Fetch-Mode": "navigate",
+    },
+}
+
+
+# ---------- EXTRACTOR ALLOWLIST ----------
+# Comma-separated regexes of yt-dlp extractor names, e.g. "youtube,youtube:.*,vimeo".
+# Empty allows every extractor. Fewer extractors make each YoutubeDL cheaper
+# to build and each URL cheaper to match.
+ALLOWED_EXTRACTORS = [
+    name.strip() for name in os.environ.get("YTMP4_ALLOWED_EXTRACTORS", "").split(",") if name.strip()
+]
+# The generic extractor is the slow fallback for unknown sites; it gets its own socket timeout.
+ALLOW_GENERIC = os.environ.get("YTMP4_ALLOW_GENERIC", "1") != "0"
+GENERIC_TIMEOUT = int(os.environ.get("YTMP4_GENERIC_TIMEOUT", 10))
+
+if ALLOWED_EXTRACTORS or not ALLOW_GENERIC:
+    YDLP_COMMON["allowed_extractors"] = (ALLOWED_EXTRACTORS or ["default"]) + (
+        ["generic"] if ALLOW_GENERIC else ["-generic"]
+    )
+
+
+# ---------- METADATA CACHE ----------
+# How long an extracted info dict is reused, and how many videos are kept.
+METADATA_TTL = int(os.environ.get("YTMP4_METADATA_TTL", 30 * 60))
+METADATA_MAX_ENTRIES = int(os.environ.get("YTMP4_METADATA_MAX_ENTRIES", 256))
+# Signed format URLs closer than this to their expire= time are re-resolved before a download.
+MEDIA_URL_MARGIN = int(os.environ.get("YTMP4_MEDIA_URL_MARGIN", 10 * 60))
+# Links that failed as private, removed, geo-blocked or unsupported are not retried for this long.
+NEGATIVE_TTL = int(os.environ.get("YTMP4_NEGATIVE_TTL", 5 * 60))
+
+# ---------- PERSISTENT METADATA STORE ----------
+# SQLite file shared by every worker process on the node.
+CACHE_DIR = os.environ.get("YTMP4_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+METADATA_DB = os.environ.get("YTMP4_METADATA_DB", os.path.join(CACHE_DIR, "metadata.sqlite3"))
+METADATA_VACUUM_INTERVAL = int(os.environ.get("YTMP4_METADATA_VACUUM_INTERVAL", 10 * 60))
+
+# ---------- ARTIFACT STORE ----------
+# Finished downloads are kept here and served again to later requests.
+ARTIFACT_DIR = os.environ.get("YTMP4_ARTIFACT_DIR", os.path.join(CACHE_DIR, "artifacts"))
+ARTIFACT_MAX_BYTES = int(os.environ.get("YTMP4_ARTIFACT_MAX_BYTES", 10 * 1024**3))
+
+# ---------- FILE DELIVERY ----------
+# "memory" hands the file bytes to st.download_button; "stream" links to the
+# file server, which streams artifacts from disk in constant memory.
+DELIVERY_MODE = os.environ.get("YTMP4_DELIVERY_MODE", "memory")
+FILE_SERVER_HOST = os.environ.get("YTMP4_FILE_SERVER_HOST", "0.0.0.0")
+FILE_SERVER_PORT = int(os.environ.get("YTMP4_FILE_SERVER_PORT", 8502))
+# Address browsers use to reach the file server (e.g. behind a reverse proxy).
+FILE_SERVER_URL = os.environ.get("YTMP4_FILE_SERVER_URL", f"http://localhost:{FILE_SERVER_PORT}")
+# Lifetime of the signed links handed out by the file server.
+FILE_TOKEN_TTL = int(os.environ.get("YTMP4_FILE_TOKEN_TTL", 60 * 60))
+# HMAC secret for those links; must be the same for every worker. When unset a
+# random secret is created once in CACHE_DIR and shared through the file.
+FILE_SERVER_SECRET = os.environ.get("YTMP4_FILE_SERVER_SECRET")
+
+# ---------- DOWNLOAD JOBS ----------
+# Maximum number of downloads running at once; further jobs wait in the queue.
+DOWNLOAD_WORKERS = int(os.environ.get("YTMP4_DOWNLOAD_WORKERS", 4))
+# Finished jobs are forgotten after this many seconds.
+JOB_RETENTION = int(os.environ.get("YTMP4_JOB_RETENTION", 60 * 60))
+# Job registry shared by every server process, so a reconnecting browser finds its job.
+JOBS_DB = os.environ.get("YTMP4_JOBS_DB", os.path.join(CACHE_DIR, "jobs.sqlite3"))
+# Worker processes are replaced after this many jobs to shed heap fragmentation.
+WORKER_MAX_JOBS = int(os.environ.get("YTMP4_WORKER_MAX_JOBS", 20))
+# A job whose worker grows past this resident size is aborted (0 disables the check).
+JOB_MAX_RSS_MB = int(os.environ.get("YTMP4_JOB_MAX_RSS_MB", 1024))
+
+# ---------- PARALLEL FRAGMENTS ----------
+# Fragments fetched at once for DASH/HLS formats: a number, or "auto" to size
+# it from the throughput of single-connection downloads and FRAGMENT_TARGET_MBPS.
+FRAGMENT_CONCURRENCY = os.environ.get("YTMP4_FRAGMENT_CONCURRENCY", "auto")
+FRAGMENT_MAX_CONCURRENCY = int(os.environ.get("YTMP4_FRAGMENT_MAX_CONCURRENCY", 16))
+FRAGMENT_TARGET_MBPS = float(os.environ.get("YTMP4_FRAGMENT_TARGET_MBPS", 200))
+
+# ---------- RANGED DOWNLOADS ----------
+# Connections used to fetch a progressive single-file format in byte ranges.
+# 1 leaves the transfer to yt-dlp; jobs can override it individually.
+SEGMENTED_CONNECTIONS = int(os.environ.get("YTMP4_SEGMENTED_CONNECTIONS", 1))
+
+# ---------- PROGRESS REPORTING ----------
+# Progress is published at most every MIN_INTERVAL seconds, and only when it
+# moved by MIN_DELTA of the total or MAX_INTERVAL seconds passed.
+PROGRESS_MIN_INTERVAL = float(os.environ.get("YTMP4_PROGRESS_MIN_INTERVAL", 0.25))
+PROGRESS_MAX_INTERVAL = float(os.environ.get("YTMP4_PROGRESS_MAX_INTERVAL", 2))
+PROGRESS_MIN_DELTA = float(os.environ.get("YTMP4_PROGRESS_MIN_DELTA", 0.005))
+# Progress snapshots kept per job for the page to read.
+PROGRESS_HISTORY = int(os.environ.get("YTMP4_PROGRESS_HISTORY", 240))
+
+# ---------- STARTUP ----------
+# One JSON line per process with cold-start timings, to track regressions.
+STARTUP_LOG = os.environ.get("YTMP4_STARTUP_LOG", os.path.join(CACHE_DIR, "startup.jsonl"))
+
+
+# ---------- YOUTUBEDL POOL ----------
+# Idle YoutubeDL instances kept per option profile, in each process
+YDL_POOL_SIZE = int(os.environ.get("YTMP4_YDL_POOL_SIZE", 4))
+
+
+# ---------- SHARED YT-DLP CACHE ----------
+# yt-dlp's cache (parsed YouTube player code), shared by every process
+YDL_CACHE_DIR = os.environ.get("YTMP4_YDL_CACHE_DIR", os.path.join(CACHE_DIR, "yt-dlp"))
+YDLP_COMMON["cachedir"] = YDL_CACHE_DIR
+# Opt-in: a video extracted during warm-up so the current player is cached before
+# the first request. Off by default because it costs a network extraction per start.
+YDL_CACHE_PREWARM_URL = os.environ.get("YTMP4_YDL_CACHE_PREWARM_URL", "")
+
+
+# ---------- USAGE COUNTER ----------
+USAGE_COUNTER_FILE = os.environ.get("YTMP4_USAGE_COUNTER_FILE", "counter.txt")
+# Seconds between writes of new visits to disk
+USAGE_FLUSH_INTERVAL = float(os.environ.get("YTMP4_USAGE_FLUSH_INTERVAL", 10))
+
+
+# ---------- REQUEST LOG ----------
+# One JSON line per lookup and download
+REQUEST_LOG = os.environ.get("YTMP4_REQUEST_LOG", os.path.join(CACHE_DIR, "requests.jsonl"))
+# Rotated into gzip backups (requests.jsonl.1.gz, ...) past this size
+REQUEST_LOG_MAX_BYTES = int(os.environ.get("YTMP4_REQUEST_LOG_MAX_BYTES", 10 * 1024**2))
+REQUEST_LOG_BACKUPS = int(os.environ.get("YTMP4_REQUEST_LOG_BACKUPS", 5))
+
+
+# ---------- POPULAR VIDEOS ----------
+# (video, format) pairs tracked as heavy hitters
+POPULAR_TOP_K = int(os.environ.get("YTMP4_POPULAR_TOP_K", 20))
+# Requests before a tracked pair is kept warm and pinned in the caches
+POPULAR_MIN_COUNT = float(os.environ.get("YTMP4_POPULAR_MIN_COUNT", 3))
+# Seconds for a request's weight to halve
+POPULAR_HALF_LIFE = int(os.environ.get("YTMP4_POPULAR_HALF_LIFE", 24 * 60 * 60))
+POPULAR_PREWARM_INTERVAL = int(os.environ.get("YTMP4_POPULAR_PREWARM_INTERVAL", 5 * 60))
+# Re-download popular artifacts that are missing from the store
+POPULAR_PREWARM_ARTIFACTS = os.environ.get("YTMP4_POPULAR_PREWARM_ARTIFACTS", "1") != "0"
+# Opens the admin view at ?admin=<token>; unset disables it
+ADMIN_TOKEN = os.environ.get("YTMP4_ADMIN_TOKEN")
@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from settings import YDLP_COMMON, CACHE_DIR, STARTUP_LOG, YDL_CACHE_PREWARM_URL
+from urls import canonicalize, extractor_hint
+from ydl_pool import borrow_ydl, prewarm_ydl
+
+
+# ---------- COLD START WARM-UP ----------
+# Importing yt_dlp and compiling its extractor patterns takes most of a new
+# process's cold start. The page only needs them once a link is entered, so
+# they are loaded on a background thread while the first paint happens.
+log = logging.getLogger(__name__)
+
+_timings = {}
+_started = False
+_lock = threading.Lock()
+
+
+def _process_start():
+    # Wall-clock start of this process, from procfs where available
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, IndexError, ValueError, StopIteration):
+        return time.time()
+
+
+_PROCESS_START = _process_start()
+
+
+def _record(event, **timings):
+    entry = {"event": event, "pid": os.getpid(), "time": time.time(), **timings}
+    log.info("startup %s", entry)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(STARTUP_LOG, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError:
+        pass
+
+
+def _timed(name, step):
+    started = time.perf_counter()
+    step()
+    _timings[name] = round(time.perf_counter() - started, 4)
+
+
+def _import_yt_dlp():
+    import yt_dlp  # noqa: F401
+
+
+def _build_extractor_index():
+    # Builds the host index, and compiles the patterns that have no literal host
+    canonicalize("https://warm-up.invalid/")
+
+
+def _probe_ffmpeg():
+    from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+
+    # yt-dlp caches the result per executable for the life of the process
+    FFmpegPostProcessor.get_versions()
+
+
+def _prewarm_ydl():
+    # The first lookup borrows this instance instead of building one
+    prewarm_ydl(YDLP_COMMON)
+
+
+def _prewarm_ydl_cache():
+    # Extracting one video fetches and parses the current player into the
+    # shared cache; later lookups in any process load it from disk
+    with borrow_ydl(YDLP_COMMON) as ydl:
+        ydl.extract_info(
+            YDL_CACHE_PREWARM_URL, download=False, process=False, ie_key=extractor_hint(YDL_CACHE_PREWARM_URL)
+        )
+
+
+def _warm_up():
+    started = time.perf_counter()
+    try:
+        _timed("import_yt_dlp", _import_yt_dlp)
+        _timed("extractor_index", _build_extractor_index)
+        _timed("ffmpeg_probe", _probe_ffmpeg)
+        _timed("ydl_pool", _prewarm_ydl)
+        if YDL_CACHE_PREWARM_URL:
+            _timed("ydl_cache", _prewarm_ydl_cache)
+    except Exception:
+        log.exception("startup warm-up failed")
+    _timings["warm_up"] = round(time.perf_counter() - started, 4)
+    _record("warm_up", since_process_start=round(time.time() - _PROCESS_START, 4), **_timings)
+
+
+def start_warm_up():
+    """Warm up yt-dlp on a background thread; safe to call on every Streamlit rerun."""
+    global _started
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+
+
+def mark_first_paint():
+    """Record how long after process start the first page was rendered (once per process)."""
+    with _lock:
+        if "first_paint" in _timings:
+            return
+        _timings["first_paint"] = round(time.time() - _PROCESS_START, 4)
+    _record("first_paint", since_process_start=_timings["first_paint"])
+
+
+def startup_timings():
+    return dict(_timings)
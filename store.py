@@ -0,0 +1,137 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+# ---------- SQLITE BASE ----------
+class SQLiteStore:
+    """SQLite file shared between processes, with one connection per thread.
+
+    The database runs in WAL mode so readers in other workers never block
+    on a writer. Subclasses create their tables in :meth:`_create`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            self._create(conn)
+
+    def _create(self, conn):
+        raise NotImplementedError
+
+    def _connect(self):
+        # sqlite3 connections may not be shared between threads.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+# ---------- SQLITE METADATA STORE ----------
+class MetadataStore(SQLiteStore):
+    """On-disk key/value store for info dicts, shared between processes.
+
+    Each value is an ``(info, media_expires)`` pair; the info dict is stored
+    as zlib-compressed JSON with an absolute expiry time.
+    """
+
+    def __init__(self, path, vacuum_interval=600):
+        self.vacuum_interval = vacuum_interval
+        self._vacuum_thread = None
+        self._lock = threading.Lock()
+        super().__init__(path)
+
+    def _create(self, conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS metadata ("
+            " key TEXT PRIMARY KEY,"
+            " info BLOB NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " media_expires REAL)"
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(metadata)")}
+        if "media_expires" not in columns:
+            conn.execute("ALTER TABLE metadata ADD COLUMN media_expires REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS metadata_expiry ON metadata (expires_at)")
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT info, media_expires FROM metadata WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0])), row[1]
+
+    def put(self, key, value, ttl):
+        info, media_expires = value
+        blob = zlib.compress(json.dumps(info, separators=(",", ":")).encode("utf-8"))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO metadata (key, info, expires_at, media_expires) VALUES (?, ?, ?, ?)",
+                (key, blob, time.time() + ttl, media_expires),
+            )
+
+    def evict_expired(self):
+        with self._connect() as conn:
+            deleted = conn.execute("DELETE FROM metadata WHERE expires_at <= ?", (time.time(),)).rowcount
+        if deleted:
+            self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return deleted
+
+    def start_vacuum(self):
+        """Start the background thread that evicts expired rows (once per process)."""
+        with self._lock:
+            if self._vacuum_thread is not None:
+                return
+            self._vacuum_thread = threading.Thread(target=self._vacuum_loop, name="metadata-vacuum", daemon=True)
+            self._vacuum_thread.start()
+
+    def _vacuum_loop(self):
+        while True:
+            time.sleep(self.vacuum_interval)
+            try:
+                self.evict_expired()
+            except sqlite3.Error:
+                # Another worker may hold the write lock; retry next round.
+                pass
+
+
+# ---------- SQLITE JOB REGISTRY ----------
+class JobStore(SQLiteStore):
+    """Job states as JSON documents, readable by every server process.
+
+    Lets a browser that reconnects to another process, or after a
+    restart, find its job again by id.
+    """
+
+    def _create(self, conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " finished REAL)"
+        )
+
+    def save(self, job_id, state):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, state, finished) VALUES (?, ?, ?)",
+                (job_id, json.dumps(state), state.get("finished")),
+            )
+
+    def load(self, job_id):
+        row = self._connect().execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete_finished_before(self, cutoff):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE finished < ?", (cutoff,))
@@ -1,27 +1,37 @@
+import functools
+import hmac
+
 import streamlit as st
-from yt_dlp import YoutubeDL
-import tempfile
-import os
-import time
-
-
-# ---------- COMMON YT-DLP SETTINGS (Fixes 403 Forbidden) ----------
-YDLP_COMMON = {
-    "quiet": True,
-    "user_agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/120.0.0.0 Safari/537.36"
-    ),
-    "http_headers": {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        ),
-        "Accept-Language": "en-US,en;q=0.9",
-        "Sec-Fetch-Mode": "navigate",
-    },
+
+from settings import DELIVERY_MODE, ADMIN_TOKEN
+from metadata import get_preview, peek_info, prefetch_info, cache_stats, LookupFailed
+from artifacts import artifact_stats
+from jobs import submit_download, get_job, speedup
+from pipeline import SessionPipeline
+from request_log import request_log_stats
+from popular import record_request, popular, start_prewarming
+from urls import video_key
+from file_server import artifact_url, start_file_server
+from startup import start_warm_up, mark_first_paint, startup_timings
+from usage import count_visit, usage_total
+from ydl_cache import ydl_cache_stats
+from ydl_pool import ydl_pool_stats
+
+
+# Load yt-dlp in the background while the page renders
+start_warm_up()
+
+if DELIVERY_MODE == "stream":
+    start_file_server()
+
+# Keep the most requested videos' metadata and files warm
+start_prewarming()
+
+
+# ---------- NO FFMPEG VIDEO (MP4) / AUDIO (M4A) ----------
+FORMATS = {
+    "Video": "best[ext=mp4]/best",
+    "Audio": "bestaudio[ext=m4a]/bestaudio",
 }
 
 
@@ -43,21 +53,130 @@ st.markdown('<div class="centered">', unsafe_allow_html=True)
 
 # ---------- APP TITLE ----------
 st.title("YouTube & Video Downloader")
+mark_first_paint()
+
+
+# ---------- JOB REATTACH ----------
+# The running job's id is kept in the URL (?job=...), so a refreshed or
+# reconnected browser picks the same download back up instead of restarting it.
+if "url" not in st.session_state:
+    attached = get_job(st.query_params.get("job"))
+    if attached is not None:
+        st.session_state.url = attached.url
+        st.session_state.choice = next(
+            (name for name, selector in FORMATS.items() if selector == attached.format_selector), "Video"
+        )
+
+
+# ---------- USAGE COUNTER ----------
+if "counted" not in st.session_state:
+    st.session_state.counted = True
+    count_visit()
 
 
 # ---------- URL INPUT ----------
 url = st.text_input(
     "Paste YouTube or video link:",
-    placeholder="https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    placeholder="https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    key="url",
 )
 
 
+# ---------- DOWNLOAD STATUS ----------
+PHASES = {
+    "queued": "Queued…",
+    "resolving": "Resolving formats…",
+    "downloading": "Starting…",
+    "finalizing": "Finalizing…",
+}
+
+
+@st.fragment(run_every=0.5)
+def show_progress(job_id):
+    # Polls the background job without rerunning the whole page. Looked up
+    # on every tick: a job run by another process is a registry snapshot.
+    job = get_job(job_id)
+    if job is None or not job.active:
+        st.rerun()
+    if job.total_bytes:
+        percent = job.downloaded_bytes / job.total_bytes
+        st.progress(min(percent, 1.0))
+        status = f"Downloading… {percent*100:.1f}%"
+        if job.speed:
+            status += f" | {job.speed / 1e6:.1f} MB/s"
+        if job.eta is not None:
+            status += f" | Time Left: {int(job.eta)}s"
+        st.write(status)
+        # Speed over the recent snapshots, also for jobs reattached from the registry.
+        # list() copies the deque atomically; iterating it directly races the
+        # progress listener appending to it.
+        speeds = [speed / 1e6 for _, _, speed in list(job.history) if speed is not None]
+        if len(speeds) > 1:
+            st.line_chart(speeds, height=80, x_label="", y_label="MB/s")
+    else:
+        st.progress(0)
+        st.write(PHASES.get(job.phase, "Starting…"))
+
+
+def read_artifact(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def prepare_delivery(job, info, choice):
+    # Transfer metrics (absent when the file came from the artifact store)
+    caption = None
+    if job.throughput:
+        caption = f"{job.throughput / 1e6:.1f} MB/s"
+        if job.fragmented:
+            caption += f" with {job.fragment_concurrency} parallel fragments"
+        elif job.segmented:
+            caption += f" over {job.connections} connections"
+        if speedup(job):
+            caption += f" ({speedup(job):.1f}× one connection)"
+
+    if choice == "Video":
+        label, file_name, mime = "Download Video", f"{info['title']}.mp4", "video/mp4"
+    else:
+        label, file_name, mime = "Download Audio", f"{info['title']}.m4a", "audio/mp4"
+    return {"caption": caption, "label": label, "file_name": file_name, "mime": mime}
+
+
+def deliver(job, delivery):
+    st.success("✅ Download ready!")
+    if delivery["caption"]:
+        st.caption(delivery["caption"])
+
+    # Download button
+    if DELIVERY_MODE == "stream":
+        # Streamed from disk by the file server; nothing is loaded into memory
+        st.link_button(delivery["label"], artifact_url(job.artifact_key, job.filepath))
+    else:
+        # The file is only read when the button is clicked, not on every rerun
+        st.download_button(
+            delivery["label"],
+            functools.partial(read_artifact, job.filepath),
+            file_name=delivery["file_name"],
+            mime=delivery["mime"],
+        )
+
+
 # ---------- MAIN LOGIC ----------
+# Stage outputs live in the session, so a widget rerun never redoes a stage
+# whose inputs did not change.
+pipeline = st.session_state.setdefault("pipeline", SessionPipeline())
+
 if url.strip():
     try:
-        # Metadata extraction with browser headers
-        with YoutubeDL(YDLP_COMMON) as ydl:
-            info = ydl.extract_info(url, download=False)
+        # Resolve: a quick preview first where the site has one; full format resolution continues in
+        # the background and is ready (or nearly) when Download is pressed
+        key = video_key(url)
+        new_video = pipeline.get("resolve", key) is None
+        info = pipeline.run("resolve", key, lambda: get_preview(url))
+        if new_video:
+            # Counted once per session, and only for links that resolve
+            record_request(url)
+        prefetch_info(url)
 
         # Display info
         st.subheader(info.get("title", ""))
@@ -66,74 +185,38 @@ if url.strip():
         st.caption(info.get("uploader", "Unknown"))
 
         # Choose type
-        choice = st.radio("Download type:", ["Video", "Audio"], index=0, horizontal=True)
+        choice = st.radio("Download type:", list(FORMATS), index=0, horizontal=True, key="choice")
+        format_selector = pipeline.run("choose", choice, lambda: FORMATS[choice])
 
-        # Download button
+        # Download button: only queues a background job, reusing the resolved info
+        download_inputs = (key, format_selector)
         if st.button("Download"):
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-
-            # Progress display
-            def progress_hook(d):
-                if d["status"] == "downloading":
-                    downloaded = d.get("downloaded_bytes", 0)
-                    total = d.get("total_bytes") or d.get("total_bytes_estimate")
-                    if total:
-                        percent = downloaded / total
-                        progress_bar.progress(min(percent, 1.0))
-                        status_text.write(f"Downloading… {percent*100:.1f}%")
-                elif d["status"] == "finished":
-                    status_text.write("Finalizing…")
-
-            with tempfile.TemporaryDirectory() as tmpdir:
-
-                # -------- NO FFMPEG VIDEO (MP4) --------
-                if choice == "Video":
-                    ydl_opts = {
-                        **YDLP_COMMON,
-                        "format": "best[ext=mp4]/best",
-                        "outtmpl": os.path.join(tmpdir, "%(title)s.%(ext)s"),
-                        "progress_hooks": [progress_hook],
-                    }
-
-                # -------- NO FFMPEG AUDIO (M4A) --------
-                else:
-                    ydl_opts = {
-                        **YDLP_COMMON,
-                        "format": "bestaudio[ext=m4a]/bestaudio",
-                        "outtmpl": os.path.join(tmpdir, "%(title)s.%(ext)s"),
-                        "progress_hooks": [progress_hook],
-                    }
-
-                # Download
-                with YoutubeDL(ydl_opts) as ydl:
-                    downloaded_info = ydl.extract_info(url)
-
-                # Get file path
-                filepath = ydl.prepare_filename(downloaded_info)
-
-                # Load file bytes
-                with open(filepath, "rb") as f:
-                    data = f.read()
-
-                st.success("✅ Download ready!")
-
-                # Download button
-                if choice == "Video":
-                    st.download_button(
-                        "Download Video",
-                        data,
-                        file_name=f"{downloaded_info['title']}.mp4",
-                        mime="video/mp4",
-                    )
-                else:
-                    st.download_button(
-                        "Download Audio",
-                        data,
-                        file_name=f"{downloaded_info['title']}.m4a",
-                        mime="audio/mp4",
-                    )
-
+            record_request(url, format_selector)
+            job = submit_download(url, format_selector, info=peek_info(url))
+            pipeline.set("download", download_inputs, job.id)
+            st.query_params["job"] = job.id
+        elif pipeline.get("download", download_inputs) is None:
+            # Reattach to the job in the URL, e.g. after a refresh
+            attached = get_job(st.query_params.get("job"))
+            if attached is not None and attached.matches(url, format_selector):
+                pipeline.set("download", download_inputs, attached.id)
+
+        job = get_job(pipeline.get("download", download_inputs))
+        if job is not None:
+            if job.active:
+                show_progress(job.id)
+            elif job.status == "failed":
+                st.error(f"An error occurred:\n{job.error}")
+            else:
+                # Deliver: prepared once per finished job
+                delivery = pipeline.run("deliver", job.id, lambda: prepare_delivery(job, info, choice))
+                deliver(job, delivery)
+
+    except LookupFailed as e:
+        if e.reason == "invalid":
+            st.warning(str(e))
+        else:
+            st.error(f"This link cannot be downloaded ({e.reason}):\n{str(e)}")
     except Exception as e:
         st.error(f"An error occurred:\n{str(e)}")
 
@@ -141,6 +224,28 @@ if url.strip():
 st.markdown('</div>', unsafe_allow_html=True)
 
 
+# ---------- ADMIN VIEW ----------
+# Compared as bytes: compare_digest() raises on non-ASCII text
+if ADMIN_TOKEN and hmac.compare_digest(st.query_params.get("admin", "").encode(), ADMIN_TOKEN.encode()):
+    with st.expander("Admin", expanded=True):
+        st.write("Most requested videos (decayed counts; page views have no format)")
+        st.dataframe(
+            [
+                {"video": key, "format": format_selector or "", "requests": round(count, 1)}
+                for (key, format_selector), count in popular(min_count=0)
+            ]
+        )
+        st.json({
+            "visits": usage_total(),
+            "metadata cache": cache_stats(),
+            "artifacts": artifact_stats(),
+            "yt-dlp pool": ydl_pool_stats(),
+            "yt-dlp cache": ydl_cache_stats(),
+            "request log": request_log_stats(),
+            "startup": startup_timings(),
+        })
+
+
 # ---------- FOOTER ----------
 st.markdown("""
 <div class="footer">
@@ -0,0 +1,49 @@
+import time
+from urllib.parse import urlparse
+
+import pytest
+
+from file_server import _parse_range, _sign, _token_valid, artifact_url
+
+_KEY = "0" * 32
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-99", (0, 99)),
+        ("bytes=100-", (100, 999)),
+        ("bytes=-100", (900, 999)),
+        ("bytes=-5000", (0, 999)),
+        ("bytes=900-5000", (900, 999)),
+        (" bytes=0-0 ", (0, 0)),
+        ("bytes=1000-", "invalid"),
+        ("bytes=5000-6000", "invalid"),
+        ("bytes=50-10", None),
+        ("bytes=-", None),
+        ("bytes=0-1,5-9", None),
+        ("items=0-99", None),
+    ],
+)
+def test_parse_range(header, expected):
+    assert _parse_range(header, 1000) == expected
+
+
+def test_signed_link_is_valid():
+    query = urlparse(artifact_url(_KEY, "/store/video.mp4")).query
+    assert _token_valid(_KEY, query)
+    assert not _token_valid("1" * 32, query)
+
+
+def test_bad_tokens_are_rejected():
+    future = str(int(time.time()) + 60)
+    past = str(int(time.time()) - 60)
+    for query in (
+        f"exp={past}&sig={_sign(_KEY, past)}",
+        f"exp={future}&sig={'0' * 64}",
+        f"exp={future}",
+        f"exp={'٣' * 11}&sig={'0' * 64}",
+        f"exp={future}&sig={'é' * 64}",
+        "",
+    ):
+        assert _token_valid(_KEY, query) is False
@@ -0,0 +1,36 @@
+import random
+
+import pytest
+
+from log_report import QuantileSketch
+
+
+def _exact(values, q):
+    return sorted(values)[int(q * (len(values) - 1))]
+
+
+@pytest.mark.parametrize("q", [0.0, 0.5, 0.95, 0.99, 1.0])
+def test_quantile_within_accuracy(q):
+    rng = random.Random(1)
+    values = [rng.lognormvariate(0, 2) for _ in range(10_000)]
+    sketch = QuantileSketch(accuracy=0.01)
+    for value in values:
+        sketch.add(value)
+    assert sketch.quantile(q) == pytest.approx(_exact(values, q), rel=0.01)
+
+
+def test_empty_sketch():
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_merge_matches_single_sketch():
+    rng = random.Random(2)
+    values = [rng.expovariate(1) for _ in range(2_000)]
+    whole, left, right = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for i, value in enumerate(values):
+        whole.add(value)
+        (left if i % 2 else right).add(value)
+    left.merge(right)
+    assert left.count == whole.count
+    assert left.buckets == whole.buckets
+    assert left.quantile(0.95) == whole.quantile(0.95)
@@ -0,0 +1,41 @@
+import random
+from collections import Counter
+
+import pytest
+
+from popular import CountMinSketch, HeavyHitters
+
+
+def test_count_min_never_undercounts():
+    rng = random.Random(3)
+    items = [f"video-{rng.randrange(500)}" for _ in range(5_000)]
+    sketch = CountMinSketch(width=64, depth=4)
+    estimates = {}
+    for item in items:
+        estimates[item] = sketch.add(item)
+    for item, count in Counter(items).items():
+        assert estimates[item] >= count
+
+
+def test_heavy_hitters_finds_top_k():
+    rng = random.Random(4)
+    requests = [(f"hot-{n}", None) for n in range(3) for _ in range(100 * (n + 1))]
+    requests += [(f"cold-{rng.randrange(1000)}", "best") for _ in range(1_000)]
+    rng.shuffle(requests)
+    hitters = HeavyHitters(k=3)
+    for item in requests:
+        hitters.add(item)
+    top = hitters.top()
+    assert [item for item, _ in top] == [("hot-2", None), ("hot-1", None), ("hot-0", None)]
+    assert [count for _, count in top] == sorted((count for _, count in top), reverse=True)
+
+
+def test_heavy_hitters_decay():
+    hitters = HeavyHitters(k=2)
+    for _ in range(8):
+        hitters.add(("old", None))
+    hitters.decay(0.25)
+    assert hitters.top() == [(("old", None), pytest.approx(2))]
+    for _ in range(3):
+        hitters.add(("new", None))
+    assert [item for item, _ in hitters.top()] == [("new", None), ("old", None)]
@@ -0,0 +1,83 @@
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import segmented
+
+_DATA = os.urandom(1024 * 1024 + 123)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # "range", "no-range" (always 200), "forbidden" (always 403) or "fail" (only the probe succeeds)
+    mode = "range"
+
+    def do_GET(self):
+        if self.mode == "forbidden":
+            self._send(403, b"")
+            return
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if self.mode == "no-range" or match is None:
+            self._send(200, _DATA)
+            return
+        start, end = int(match.group(1)), int(match.group(2))
+        if self.mode == "fail" and (start, end) != (0, 0):
+            self._send(500, b"")
+            return
+        self._send(206, _DATA[start : end + 1], {"Content-Range": f"bytes {start}-{end}/{len(_DATA)}"})
+
+    def _send(self, status, body, headers=()):
+        self.send_response(status)
+        for name, value in dict(headers).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+
+    def url(mode):
+        monkeypatch.setattr(_Handler, "mode", mode)
+        return f"http://127.0.0.1:{httpd.server_port}/video.mp4"
+
+    yield url
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_assembles_ranges(server, tmp_path):
+    filepath = tmp_path / "video.mp4"
+    reported = []
+    segmented.download(
+        server("range"), {}, str(filepath), connections=4, segment_size=100_000,
+        progress=lambda done, total: reported.append((done, total)),
+    )
+    assert filepath.read_bytes() == _DATA
+    assert reported[-1] == (len(_DATA), len(_DATA))
+    assert [done for done, _ in reported] == sorted(done for done, _ in reported)
+
+
+@pytest.mark.parametrize("mode", ["no-range", "forbidden"])
+def test_unusable_server_falls_back(server, tmp_path, mode):
+    # The worker hands SegmentedDownloadError back to yt-dlp's own downloader
+    filepath = tmp_path / "video.mp4"
+    with pytest.raises(segmented.SegmentedDownloadError):
+        segmented.download(server(mode), {}, str(filepath), connections=4)
+    assert not filepath.exists()
+
+
+def test_failed_download_removes_partial_file(server, tmp_path):
+    filepath = tmp_path / "video.mp4"
+    with pytest.raises(segmented.SegmentedDownloadError):
+        segmented.download(server("fail"), {}, str(filepath), connections=4, segment_size=100_000)
+    assert not filepath.exists()
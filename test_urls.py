@@ -0,0 +1,130 @@
+import re
+
+import pytest
+
+import urls
+from urls import canonicalize, url_problem, video_key
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "youtu.be/dQw4w9WgXcQ",
+        "https://vimeo.com/123456",
+        "http://192.168.1.10/video.mp4",
+        "https://пример.рф/video",
+        "https://example.xn--p1ai/video",
+    ],
+)
+def test_url_problem_accepts(url):
+    assert url_problem(url) is None
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "",
+        "not a link",
+        "ftp://example.com/video.mp4",
+        "https://localhost/video",
+        "https://example/video",
+        "https://-bad-.com/video",
+        "https://example.c0m/video",
+        "https://" + "a" * 64 + ".com/video",
+        "https://www.youtube.com/",
+        "https://www.youtube.com/watch?v=short",
+        "https://youtu.be/",
+        "https://www.youtube.com/shorts/short",
+    ],
+)
+def test_url_problem_rejects(url):
+    assert url_problem(url) is not None
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+        "https://youtube.com/watch?v=dQw4w9WgXcQ&t=42",
+        "https://m.youtube.com/watch?v=dQw4w9WgXcQ",
+        "https://music.youtube.com/watch?v=dQw4w9WgXcQ",
+        "https://youtu.be/dQw4w9WgXcQ?si=abc",
+        "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+        "https://www.youtube.com/embed/dQw4w9WgXcQ",
+        "https://www.youtube.com/live/dQw4w9WgXcQ",
+        "  www.youtube.com/watch?v=dQw4w9WgXcQ  ",
+    ],
+)
+def test_canonicalize_youtube_spellings(url):
+    assert canonicalize(url) == ("Youtube", "dQw4w9WgXcQ")
+    assert video_key(url) == "youtube:dQw4w9WgXcQ"
+
+
+
+def test_youtube_shortcut_respects_allowlist(monkeypatch):
+    monkeypatch.setattr(urls, "_ALLOWED", [re.compile("vimeo", re.I)])
+    monkeypatch.setattr(urls, "_extractors", None)
+    monkeypatch.setattr(urls, "_index", None)
+    urls._candidates.cache_clear()
+    canonicalize.cache_clear()
+    assert canonicalize("https://youtu.be/dQw4w9WgXcQ") == (None, None)
+    urls._candidates.cache_clear()
+    canonicalize.cache_clear()
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://www.youtube.com/clip/UgkxU2HSeGL_NvmDJ-nQJrlLwllwMDBdGZFs",
+        "https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL590L5WQmH8fJ54F369BLDSqIwcs-TCfs",
+        "https://www.youtube.com/playlist?list=PL590L5WQmH8fJ54F369BLDSqIwcs-TCfs",
+    ],
+)
+def test_url_problem_leaves_other_youtube_paths_to_yt_dlp(url):
+    assert url_problem(url) is None
+
+
+def test_video_key_skips_matching_for_invalid_input(monkeypatch):
+    monkeypatch.setattr(urls, "_match_extractor", lambda *args: pytest.fail("matched invalid input"))
+    assert video_key(" https://exa ") == "https://exa"
+
+
+@pytest.mark.parametrize(
+    "pattern, host",
+    [
+        (r"https?://(?:www\.)?vimeo\.com/(?P<id>\d+)", "vimeo.com"),
+        (r"(?i)https?://player\.Vimeo\.com/video/(?P<id>\d+)", "player.vimeo.com"),
+        (r"(?:https?://)?(?:www\.|m\.)?example\.org(?:/|$)", "example.org"),
+        (r"(?:https?:)?//(?:(?:www|m)\.)?bbv\-tv\.net/", "bbv-tv.net"),
+        ("(?x)\n    https?://\n    (?:www\\.)?  # optional\n    example\\.com/(?P<id>[0-9]+)", "example.com"),
+        (r"https?://(?:www\.)?(?:vimeo|vimeopro)\.com/", None),
+        (r"https?://(?:www\.)?youtube\.com/?(?:[?#]|$)|:ytrec(?:ommended)?", None),
+        (r"(?:cbcplayer:|https?://(?:www\.)?cbc\.ca/player/play/)(?P<id>.+)", None),
+        (r"https?://(?:[^/]+\.)?example\.com[a-z]*/", None),
+        (r"https?://(?:www|m)example\.com/", None),
+    ],
+)
+def test_literal_host(pattern, host):
+    assert urls._literal_host(pattern) == host
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://vimeo.com/123456",
+        "https://player.vimeo.com/video/123456",
+        "https://www.dailymotion.com/video/x7tgad0",
+        "https://soundcloud.com/artist/track",
+        "https://x.com/user/status/1234567890",
+        "https://www.twitch.tv/videos/123456",
+        "https://www.tiktok.com/@user/video/7000000000000000000",
+        "https://www.youtube.com/clip/UgkxU2HSeGL_NvmDJ-nQJrlLwllwMDBdGZFs",
+        "https://www.bbc.co.uk/iplayer/episode/b0000000",
+        "https://example.com/video.mp4",
+    ],
+)
+def test_index_matches_full_scan(url):
+    host = url.split("/")[2]
+    full_scan = next((ie for ie in urls._all_extractors() if ie.suitable(url)), None)
+    assert urls._match_extractor(url, host) is full_scan
@@ -0,0 +1,52 @@
+import multiprocessing
+import threading
+
+import pytest
+
+import usage
+from usage import UsageCounter
+
+_PROCESSES = 4
+_THREADS = 4
+_INCREMENTS = 2000
+
+
+def _count(path, compact_bytes):
+    # Runs in a spawned process
+    usage._COMPACT_BYTES = compact_bytes
+    counter = UsageCounter(path, flush_interval=0.01)
+
+    def run():
+        for _ in range(_INCREMENTS):
+            counter.increment()
+
+    threads = [threading.Thread(target=run) for _ in range(_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.flush()
+
+
+@pytest.mark.parametrize("compact_bytes", [64 * 1024, 16])
+def test_processes_and_threads_lose_no_counts(tmp_path, compact_bytes):
+    path = str(tmp_path / "counter.txt")
+    with open(path, "w") as f:
+        f.write("5")
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_count, args=(path, compact_bytes)) for _ in range(_PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+    assert UsageCounter(path, flush_interval=60).total() == 5 + _PROCESSES * _THREADS * _INCREMENTS
+
+
+def test_total_includes_unflushed_counts(tmp_path):
+    counter = UsageCounter(str(tmp_path / "counter.txt"), flush_interval=60)
+    for _ in range(3):
+        counter.increment()
+    assert counter.total() == 3
+    counter.flush()
+    assert counter.total() == 3
@@ -0,0 +1,281 @@
+import functools
+import re
+from urllib.parse import urlparse, parse_qs
+
+from settings import ALLOWED_EXTRACTORS
+
+
+# ---------- CANONICAL VIDEO KEYS ----------
+_YOUTUBE_HOSTS = {"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com"}
+_YOUTUBE_PATH = re.compile(r"^/(?:shorts|embed|live|v)/([0-9A-Za-z_-]{11})")
+_YOUTUBE_ID = re.compile(r"^[0-9A-Za-z_-]{11}$")
+_YOUTUBE_PATH_PREFIX = re.compile(r"^/(?:shorts|embed|live|v)/")
+
+
+def _parse(url):
+    url = url.strip()
+    return url, urlparse(url if "://" in url else "https://" + url)
+
+
+def _youtube_id(parsed):
+    host = (parsed.hostname or "").lower()
+    video_id = None
+    if host == "youtu.be":
+        video_id = parsed.path.lstrip("/").split("/")[0]
+    elif host in _YOUTUBE_HOSTS:
+        if parsed.path == "/watch":
+            video_id = parse_qs(parsed.query).get("v", [None])[0]
+        else:
+            match = _YOUTUBE_PATH.match(parsed.path)
+            video_id = match.group(1) if match else None
+    return video_id if video_id and _YOUTUBE_ID.match(video_id) else None
+
+
+# ---------- LOCAL VALIDATION ----------
+_HOST_LABEL = re.compile(r"^(?!-)[a-z0-9-]{1,63}(?<!-)$")
+_IPV4 = re.compile(r"^\d{1,3}(?:\.\d{1,3}){3}$")
+
+
+def url_problem(url):
+    """Describe why ``url`` cannot be a video link, or return None if it might be one.
+
+    Only checks what can be decided locally, so half-typed or malformed
+    input is rejected before any network request.
+    """
+    url, parsed = _parse(url)
+    if not url or any(c.isspace() for c in url):
+        return "That does not look like a link."
+    if parsed.scheme not in ("http", "https"):
+        return "Only http:// and https:// links are supported."
+
+    host = (parsed.hostname or "").lower()
+    try:
+        # Internationalized names are checked in their ASCII (punycode) form
+        ascii_host = host.encode("idna").decode("ascii")
+    except UnicodeError:
+        return "The link has no valid host name."
+    labels = ascii_host.split(".")
+    tld = labels[-1]
+    if not (
+        _IPV4.match(ascii_host)
+        or (
+            len(labels) >= 2
+            and all(map(_HOST_LABEL.match, labels))
+            and ((tld.isalpha() and len(tld) >= 2) or tld.startswith("xn--"))
+        )
+    ):
+        return "The link has no valid host name."
+
+    if _youtube_not_a_video(parsed):
+        return "This YouTube link does not point to a single video."
+    return None
+
+
+def _youtube_not_a_video(parsed):
+    # Only the spellings _youtube_id() knows, with a missing or malformed id;
+    # other YouTube paths (e.g. /clip/...) are left for yt-dlp to decide
+    host = (parsed.hostname or "").lower()
+    if host == "youtu.be":
+        known = True
+    elif host in _YOUTUBE_HOSTS:
+        known = parsed.path in ("", "/", "/watch") or bool(_YOUTUBE_PATH_PREFIX.match(parsed.path))
+    else:
+        known = False
+    return known and _youtube_id(parsed) is None
+
+
+# ---------- EXTRACTOR DISPATCH INDEX ----------
+# yt-dlp tests every extractor's _VALID_URL in turn and takes the first that
+# matches. Most patterns name a literal host ("https?://(?:www\.)?vimeo\.com/"),
+# so extractors are indexed by it once: a URL is only tested against the
+# extractors for its host and its parent domains, plus those without a
+# literal host, merged back into yt-dlp's order so the first match is the same.
+_extractors = None
+_index = None
+
+# Same matching as yt-dlp's allowed_extractors option
+_ALLOWED = [re.compile(name, re.I) for name in ALLOWED_EXTRACTORS]
+
+# A pattern is indexed only when it is a plain sequence: an http(s) scheme,
+# optional "(?:www\.)?"-style prefixes that end at a label boundary, a literal
+# domain, then the end of the host. Anything else (e.g. "(?:foo:|https?://...)"
+# or a domain with alternatives) is left to the ordered scan.
+_PATTERN_FLAGS = re.compile(r"^\(\?(?P<flags>[aiLmsux]+)\)")
+_PATTERN_SCHEME = re.compile(r"^(?:https\??:|\(\?:https\??:\)\??|(?P<open>\(\?:https\??:))?//")
+_PATTERN_HOST = re.compile(r"(?P<host>(?:(?:[A-Za-z0-9-]|\\-)+\\\.)+(?:[A-Za-z0-9-]|\\-)+)(?:/|\\/|:|\$|\(\?:[/:$])")
+
+
+def _allowed(ie_name):
+    return not _ALLOWED or any(p.fullmatch(ie_name.lower()) for p in _ALLOWED)
+
+
+def _all_extractors():
+    global _extractors
+    if _extractors is None:
+        from yt_dlp.extractor import gen_extractor_classes
+
+        # The generic extractor matches everything; it is never a useful hint
+        _extractors = [ie for ie in gen_extractor_classes() if ie.ie_key() != "Generic" and _allowed(ie.IE_NAME)]
+    return _extractors
+
+
+def _defined_by(cls, name):
+    return next(c for c in cls.__mro__ if name in vars(c))
+
+
+def _scan(pattern):
+    # (index, char, group depth) for the characters outside classes and escapes
+    depth, in_class, escaped = 0, False, False
+    for index, char in enumerate(pattern):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        else:
+            depth -= char == ")"
+            yield index, char, depth
+            depth += char == "("
+
+
+def _strip_verbose(pattern):
+    # Drops the whitespace and comments that re.VERBOSE ignores
+    kept, in_class, escaped, comment = [], False, False, False
+    for char in pattern:
+        if comment:
+            comment = char != "\n"
+            continue
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char.isspace():
+            continue
+        elif char == "#":
+            comment = True
+            continue
+        kept.append(char)
+    return "".join(kept)
+
+
+def _alternatives(pattern):
+    cuts = [index for index, char, depth in _scan(pattern) if char == "|" and depth == 0]
+    return [pattern[start + 1 : end] for start, end in zip([-1, *cuts], [*cuts, len(pattern)])]
+
+
+def _skip_prefixes(host_part):
+    # Skips "(?:...)" groups whose every alternative ends with a dot, so the
+    # domain after them starts at a label boundary
+    while host_part.startswith("(?:"):
+        end = next((index for index, char, depth in _scan(host_part) if char == ")" and depth == 0), None)
+        if end is None or not all(alt.endswith("\\.") for alt in _alternatives(host_part[3:end])):
+            break
+        host_part = host_part[end + 1 :]
+        if host_part[:1] in ("?", "*", "+"):
+            host_part = host_part[1:]
+    return host_part
+
+
+def _literal_host(pattern):
+    flags = _PATTERN_FLAGS.match(pattern)
+    if flags:
+        pattern = pattern[flags.end() :]
+        if "x" in flags.group("flags"):
+            pattern = _strip_verbose(pattern)
+    scheme = _PATTERN_SCHEME.match(pattern)
+    if scheme is None or len(_alternatives(pattern)) > 1:
+        return None
+    host_part = pattern[scheme.end() :]
+    if scheme.group("open"):
+        # "(?:https?://)?" has to close right after the slashes
+        if not host_part.startswith(")"):
+            return None
+        host_part = host_part[2:] if host_part.startswith(")?") else host_part[1:]
+    match = _PATTERN_HOST.match(_skip_prefixes(host_part))
+    return match and match.group("host").replace("\\", "").lower()
+
+
+def _literal_hosts(ie):
+    """Domains every URL ``ie`` accepts is on (or below), or None if that is not certain."""
+    # A custom suitable() may accept URLs its pattern does not
+    if _defined_by(ie, "suitable") is not _defined_by(ie, "_match_valid_url"):
+        return None
+    patterns = ie._VALID_URL
+    if not patterns:
+        return None
+    hosts = {_literal_host(pattern) for pattern in ([patterns] if isinstance(patterns, str) else patterns)}
+    return None if None in hosts else hosts
+
+
+def _build_index():
+    global _index
+    if _index is None:
+        extractors = _all_extractors()
+        by_host = {}
+        unindexed = []
+        for position, ie in enumerate(extractors):
+            hosts = _literal_hosts(ie)
+            if hosts is None:
+                unindexed.append(position)
+            for host in hosts or ():
+                by_host.setdefault(host, []).append(position)
+        _index = (extractors, by_host, unindexed)
+    return _index
+
+
+@functools.lru_cache(maxsize=1024)
+def _candidates(host):
+    extractors, by_host, unindexed = _build_index()
+    labels = host.split(".") if host else []
+    positions = set(unindexed)
+    for i in range(len(labels)):
+        positions.update(by_host.get(".".join(labels[i:]), ()))
+    return [extractors[position] for position in sorted(positions)]
+
+
+def _match_extractor(url, host):
+    # First match in yt-dlp's order among the extractors that can match
+    # this host; an earlier, more specific extractor must win over a broader one
+    return next((ie for ie in _candidates(host) if ie.suitable(url)), None)
+
+
+@functools.lru_cache(maxsize=4096)
+def canonicalize(url):
+    """Map ``url`` to ``(extractor_key, video_id)`` without network access.
+
+    Returns ``(None, None)`` when no specific extractor claims the URL;
+    yt-dlp will then fall back to its generic extractor.
+    """
+    url, parsed = _parse(url)
+    video_id = _youtube_id(parsed)
+    # The shortcut must not bypass an allowlist that leaves YouTube out
+    if video_id and _allowed("youtube"):
+        return "Youtube", video_id
+
+    ie = _match_extractor(parsed.geturl(), (parsed.hostname or "").lower())
+    if ie is None:
+        return None, None
+    return ie.ie_key(), ie.get_temp_id(parsed.geturl())
+
+
+def video_key(url):
+    """Return a stable cache key for ``url``; different spellings of one video share it."""
+    if url_problem(url):
+        # Half-typed input never reaches the extractor scan (or the yt_dlp import)
+        return url.strip()
+    extractor, video_id = canonicalize(url)
+    if extractor and video_id:
+        return f"{extractor.lower()}:{video_id}"
+    return url.strip()
+
+
+def extractor_hint(url):
+    """yt-dlp ``ie_key`` for ``url``, or None to let yt-dlp search all extractors."""
+    return canonicalize(url)[0]
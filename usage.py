@@ -0,0 +1,121 @@
+import atexit
+import fcntl
+import os
+import threading
+import time
+
+from settings import USAGE_COUNTER_FILE, USAGE_FLUSH_INTERVAL
+
+
+# ---------- USAGE COUNTER ----------
+# Counting a visit only bumps a per-thread shard in memory. A background
+# thread appends the new counts to a log under an exclusive flock, which
+# every process shares, and folds the log into the counter file with an
+# atomic rename once it grows.
+_COMPACT_BYTES = 64 * 1024
+
+
+class UsageCounter:
+    """Counter persisted to ``path`` that any number of processes can increment."""
+
+    def __init__(self, path, flush_interval):
+        self.path = path
+        self.log_path = path + ".log"
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._shards = []
+        # Counts of shards whose thread has exited
+        self._retired = 0
+        self._flushed = 0
+        self._shards_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._started = False
+
+    def increment(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = [0]
+            with self._shards_lock:
+                self._shards.append((threading.current_thread(), shard))
+                if not self._started:
+                    self._started = True
+                    threading.Thread(target=self._flush_loop, name="usage-flush", daemon=True).start()
+                    atexit.register(self.flush)
+        # Only this thread ever writes its shard
+        shard[0] += 1
+
+    def _counted(self):
+        with self._shards_lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    self._retired += shard[0]
+            self._shards = live
+            return self._retired + sum(shard[0] for _, shard in live)
+
+    def _open_log(self, operation):
+        f = open(self.log_path, "a+")
+        fcntl.flock(f, operation)
+        return f
+
+    def _read_base(self):
+        try:
+            with open(self.path) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    @staticmethod
+    def _read_log(f):
+        f.seek(0)
+        return sum(int(line) for line in f if line.strip())
+
+    def flush(self):
+        """Write counts not yet persisted to the shared log."""
+        with self._flush_lock:
+            counted = self._counted()
+            if counted == self._flushed:
+                return
+            with self._open_log(fcntl.LOCK_EX) as log:
+                log.write(f"{counted - self._flushed}\n")
+                log.flush()
+                self._flushed = counted
+                if log.tell() > _COMPACT_BYTES:
+                    self._compact(log)
+
+    def _compact(self, log):
+        # Called with the log locked exclusively
+        total = self._read_base() + self._read_log(log)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(str(total))
+        os.replace(tmp, self.path)
+        log.truncate(0)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                # Kept in memory and retried on the next flush
+                pass
+
+    def total(self):
+        """All counts from every process, including this one's unflushed ones."""
+        with self._open_log(fcntl.LOCK_SH) as log:
+            # Under the lock no flush is between writing the log and moving _flushed
+            return self._read_base() + self._read_log(log) + self._counted() - self._flushed
+
+
+_counter = UsageCounter(USAGE_COUNTER_FILE, USAGE_FLUSH_INTERVAL)
+
+
+def count_visit():
+    _counter.increment()
+
+
+def usage_total():
+    return _counter.total()
@@ -0,0 +1,90 @@
+import contextlib
+import fcntl
+import json
+import os
+import threading
+from collections import Counter
+
+
+# ---------- SHARED YT-DLP CACHE ----------
+# yt-dlp keeps the results of parsing YouTube's player JavaScript (signature
+# and n-parameter functions, signature timestamps) in its cache directory.
+# Every process points at the same directory, so a player is only downloaded
+# and parsed once per deployment instead of once per worker. yt-dlp already
+# replaces entries atomically; a sidecar lock file, held shared by readers
+# and exclusively by writers, additionally makes a reader wait for a write
+# in progress instead of missing it and parsing the player again.
+_counts = Counter()
+_lock = threading.Lock()
+
+
+def _count(section, outcome):
+    with _lock:
+        _counts[section, outcome] += 1
+
+
+class SharedCache:
+    """Replacement for a YoutubeDL's ``cache`` that locks entries and counts hits."""
+
+    def __init__(self, cache):
+        self._cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self._cache, name)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _locked(filename, exclusive):
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # Created on demand, so entries written without one (e.g. by a plain
+        # yt-dlp) are still readable
+        with open(filename + ".lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def load(self, section, key, dtype="json", default=None, *, min_ver=None):
+        if not self._cache.enabled:
+            return default
+        filename = self._cache._get_cache_fn(section, key, dtype)
+        try:
+            with self._locked(filename, exclusive=False), open(filename, encoding="utf-8") as f:
+                data = self._cache._validate(json.load(f), min_ver)
+        except OSError:
+            data = None
+        except (ValueError, KeyError):
+            self._cache._ydl.report_warning(f"Cache retrieval from {filename} failed")
+            data = None
+        _count(section, "misses" if data is None else "hits")
+        return default if data is None else data
+
+    def store(self, section, key, data, dtype="json"):
+        from yt_dlp.utils import write_json_file
+        from yt_dlp.version import __version__
+
+        if not self._cache.enabled:
+            return
+        filename = self._cache._get_cache_fn(section, key, dtype)
+        try:
+            with self._locked(filename, exclusive=True):
+                write_json_file({"yt-dlp_version": __version__, "data": data}, filename)
+        except OSError as e:
+            self._cache._ydl.report_warning(f"Writing cache to {filename} failed: {e}")
+            return
+        _count(section, "stores")
+
+
+def install_shared_cache(ydl):
+    ydl.cache = SharedCache(ydl.cache)
+
+
+def ydl_cache_stats():
+    """Per-section hits, misses and stores of this process's yt-dlp cache lookups."""
+    with _lock:
+        counts = dict(_counts)
+    stats = {}
+    for (section, outcome), count in counts.items():
+        stats.setdefault(section, {"hits": 0, "misses": 0, "stores": 0})[outcome] = count
+    for entry in stats.values():
+        lookups = entry["hits"] + entry["misses"]
+        entry["hit_rate"] = entry["hits"] / lookups if lookups else 0.0
+    return stats
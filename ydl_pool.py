@@ -0,0 +1,118 @@
+import contextlib
+import json
+import threading
+
+from settings import YDL_POOL_SIZE
+from ydl_cache import install_shared_cache
+
+
+# ---------- YOUTUBEDL INSTANCE POOL ----------
+# A YoutubeDL builds its request handlers, cookie jar and extractor table in
+# its constructor, and its handlers keep connections to the hosts it has
+# talked to. Returning instances to a pool instead of closing them reuses
+# keep-alive connections and TLS sessions across lookups and downloads.
+class YoutubeDLPool:
+    """Idle YoutubeDL instances, at most ``max_idle`` per option profile.
+
+    A YoutubeDL is not thread-safe, so each borrower has exclusive use of its
+    instance until it is returned.
+    """
+
+    def __init__(self, max_idle):
+        self.max_idle = max_idle
+        self.created = 0
+        self.reused = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _profile(options):
+        return json.dumps(options, sort_keys=True, default=repr)
+
+    def _create(self, options):
+        from yt_dlp import YoutubeDL
+
+        # Progress hooks cannot be removed from a YoutubeDL, so each instance
+        # gets one hook that forwards to whoever borrowed it
+        hook = [None]
+
+        def forward(d):
+            if hook[0] is not None:
+                hook[0](d)
+
+        ydl = YoutubeDL({**options, "progress_hooks": [forward]})
+        install_shared_cache(ydl)
+        return ydl, hook
+
+    @contextlib.contextmanager
+    def borrow(self, options, progress_hook=None, **overrides):
+        """Yield a YoutubeDL built from ``options``.
+
+        ``overrides`` are set in its params for this borrow only. They must be
+        options yt-dlp reads at download time (``paths``,
+        ``concurrent_fragment_downloads``), not ones it reads when the
+        instance is built, such as ``format``.
+        """
+        profile = self._profile(options)
+        with self._lock:
+            idle = self._idle.get(profile)
+            entry = idle.pop() if idle else None
+            if entry is None:
+                self.created += 1
+            else:
+                self.reused += 1
+        if entry is None:
+            entry = self._create(options)
+
+        ydl, hook = entry
+        saved = {name: ydl.params[name] for name in overrides if name in ydl.params}
+        ydl.params.update(overrides)
+        hook[0] = progress_hook
+        try:
+            yield ydl
+        finally:
+            hook[0] = None
+            for name in overrides:
+                ydl.params.pop(name, None)
+            ydl.params.update(saved)
+            self._release(profile, entry)
+
+    def _release(self, profile, entry):
+        with self._lock:
+            idle = self._idle.setdefault(profile, [])
+            if len(idle) < self.max_idle:
+                idle.append(entry)
+                return
+        entry[0].close()
+
+    def prewarm(self, options):
+        """Build one idle instance for ``options`` ahead of the first request."""
+        with self.borrow(options):
+            pass
+
+    def stats(self):
+        with self._lock:
+            borrows = self.created + self.reused
+            return {
+                "idle": sum(len(idle) for idle in self._idle.values()),
+                "created": self.created,
+                "reused": self.reused,
+                "reuse_rate": self.reused / borrows if borrows else 0.0,
+            }
+
+
+# One pool per process: the server's for lookups, each worker's for downloads.
+_pool = YoutubeDLPool(YDL_POOL_SIZE)
+
+
+def borrow_ydl(options, progress_hook=None, **overrides):
+    """Context manager lending a pooled YoutubeDL; see :meth:`YoutubeDLPool.borrow`."""
+    return _pool.borrow(options, progress_hook, **overrides)
+
+
+def prewarm_ydl(options):
+    _pool.prewarm(options)
+
+
+def ydl_pool_stats():
+    return _pool.stats()